@@ -1,12 +1,123 @@
 from google import genai
+from google.genai import types
 import json
+import threading
+import time
+from queue import Queue, Empty
+from latency import LatencyTracker
 
-def generate_gemini_response(prompt, API_KEY):
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Hedge after this many seconds until enough latencies have been observed
+DEFAULT_HEDGE_DELAY = 5.0
+MIN_HEDGE_SAMPLES = 5
+HEDGE_PERCENTILE = 95
+
+def generate_gemini_response_with_usage(prompt, API_KEY, response_schema=None, model=DEFAULT_MODEL):
+    """
+    Generate a response and report the token usage of the call.
+    With response_schema, the response is constrained to JSON matching the schema.
+
+    Returns:
+        Tuple of (response text, usage) where usage is a dict with 'tokens_in'
+        and 'tokens_out' (None when the API does not report them)
+    """
     client = genai.Client(api_key=API_KEY)
 
+    config = None
+    if response_schema is not None:
+        config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=response_schema,
+        )
+
     response = client.models.generate_content(
-        model="gemini-2.0-flash",
+        model=model,
         contents=prompt,
+        config=config,
     )
 
-    return response.text
\ No newline at end of file
+    metadata = getattr(response, 'usage_metadata', None)
+    usage = {
+        'tokens_in': getattr(metadata, 'prompt_token_count', None),
+        'tokens_out': getattr(metadata, 'candidates_token_count', None),
+    }
+    return response.text, usage
+
+def generate_gemini_response(prompt, API_KEY, model=DEFAULT_MODEL):
+    text, _ = generate_gemini_response_with_usage(prompt, API_KEY, model=model)
+    return text
+
+def get_hedge_delay(tracker: LatencyTracker) -> float:
+    """Send a hedged request once the first one is slower than the recent p95"""
+    if len(tracker) < MIN_HEDGE_SAMPLES:
+        return DEFAULT_HEDGE_DELAY
+    return tracker.percentile(HEDGE_PERCENTILE)
+
+def generate_gemini_response_hedged(prompt, API_KEY, deadline: float, tracker: LatencyTracker, response_schema=None,
+                                    model=DEFAULT_MODEL):
+    """
+    Generate a response within a deadline, hedging slow requests.
+
+    The request runs on a daemon thread. If it has not answered after the hedge
+    delay (the p95 of recent latencies), or fails early, one duplicate request is
+    sent and the first successful answer wins. Every completed request is recorded
+    in the tracker.
+
+    Args:
+        prompt: Prompt text
+        API_KEY: Gemini API key
+        deadline: Seconds to wait in total
+        tracker: Latency tracker of recent calls to the model
+        response_schema: Optional JSON schema for structured output
+        model: Gemini model name
+
+    Returns:
+        Tuple of (response text, usage) as generate_gemini_response_with_usage
+
+    Raises:
+        TimeoutError: If no request succeeded before the deadline
+        Exception: The last request error if all requests failed
+    """
+    results = Queue()
+
+    def attempt():
+        started = time.perf_counter()
+        try:
+            text, usage = generate_gemini_response_with_usage(prompt, API_KEY, response_schema, model)
+            tracker.record(time.perf_counter() - started)
+            results.put((text, usage, None))
+        except Exception as e:
+            results.put((None, None, e))
+
+    def launch():
+        threading.Thread(target=attempt, daemon=True).start()
+
+    start = time.perf_counter()
+    end = start + deadline
+    hedge_at = start + get_hedge_delay(tracker)
+    launch()
+    attempts, failures, hedged = 1, 0, False
+
+    while True:
+        now = time.perf_counter()
+        wait_until = end if hedged else min(hedge_at, end)
+        try:
+            text, usage, error = results.get(timeout=max(wait_until - now, 0))
+        except Empty:
+            if not hedged and time.perf_counter() < end:
+                launch()
+                attempts, hedged = attempts + 1, True
+                continue
+            raise TimeoutError(f"Gemini did not answer within {deadline:g} seconds")
+
+        if error is None:
+            return text, usage
+
+        failures += 1
+        if not hedged:
+            # Retry right away instead of waiting for the hedge delay
+            launch()
+            attempts, hedged = attempts + 1, True
+        elif failures == attempts:
+            raise error
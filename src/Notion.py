@@ -1,18 +1,28 @@
 import pandas as pd     
 from notion_client import Client
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 import numpy as np
 import json
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 import traceback
+import threading
 
 
 WORD_COLUMN_NAME = "Word"
 MEANING_COLUMN_NAME = "Meaning"
 MULTIPLICITY_COLUMN_NAME = "Multiplicity"
 CREATED_TIME_COLUMN_NAME = "created_time"
+LAST_EDITED_TIME_COLUMN_NAME = "last_edited_time"  # Page metadata, used to detect edits from other devices
+SOURCE_COLUMN_NAME = "source"  # Name of the deck a word was loaded from
+
+# Optional spaced-repetition properties (number, number, number, date)
+SRS_INTERVAL_COLUMN_NAME = "Interval"
+SRS_EASE_COLUMN_NAME = "Ease"
+SRS_REPETITIONS_COLUMN_NAME = "Repetitions"
+SRS_DUE_COLUMN_NAME = "Due"
+SRS_COLUMN_NAMES = [SRS_INTERVAL_COLUMN_NAME, SRS_EASE_COLUMN_NAME, SRS_REPETITIONS_COLUMN_NAME, SRS_DUE_COLUMN_NAME]
 
 
 def setup_logger():
@@ -54,13 +64,17 @@ def fetch_page(notion: Client, database_id: str, start_cursor: str = None, page_
     return notion.databases.query(**params)
 
 
-def get_notion_database(notion_api_key: str, database_id: str, page_size: int = 100) -> List[Dict[str, Any]]:
+def get_notion_database(notion_api_key: str, database_id: str, page_size: int = 100,
+                        progress_callback: Callable[[int], None] = None,
+                        cancel_event: threading.Event = None) -> List[Dict[str, Any]]:
     """
     Get all pages from a Notion database with improved performance
     Args:
         notion_api_key: Notion API key
         database_id: ID of the Notion database
         page_size: Number of results per page (max 100)
+        progress_callback: Optional callback called with the number of pages fetched so far
+        cancel_event: Optional event; when set, fetching stops early and the partial list is returned
     Returns:
         List of database pages
     """
@@ -74,6 +88,11 @@ def get_notion_database(notion_api_key: str, database_id: str, page_size: int =
         current_results = page.get('results', [])
         results.extend(current_results)
         
+        if progress_callback is not None:
+            progress_callback(len(results))
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        
         # Check if there are more pages
         if not page.get('has_more', False):
             break
@@ -121,6 +140,24 @@ def extract_property_value(prop):
         raise ValueError(f"Unsupported property type '{prop['type']}'")
 
 
+def extract_schedule_state(properties):
+    """
+    Extract the raw spaced-repetition state of a page.
+    Unlike extract_property_value, numbers are returned as stored (no +1 offset).
+    Args:
+        properties: Notion page properties
+    Returns:
+        Dict with the SRS columns; missing properties become NaN (numbers) or None (due date)
+    """
+    state = {}
+    for col_name in (SRS_INTERVAL_COLUMN_NAME, SRS_EASE_COLUMN_NAME, SRS_REPETITIONS_COLUMN_NAME):
+        value = properties.get(col_name, {}).get('number')
+        state[col_name] = float(value) if value is not None else np.nan
+    due = properties.get(SRS_DUE_COLUMN_NAME, {}).get('date') or {}
+    state[SRS_DUE_COLUMN_NAME] = due.get('start')
+    return state
+
+
 def create_word_dataframe(database, column_names):
     """
     Create a DataFrame from Notion database with specified column names
@@ -133,32 +170,46 @@ def create_word_dataframe(database, column_names):
         ValueError: If database is empty, required columns are missing, or property type is not supported
     """
     # Extract data from database
-    data = []
-    
-    for page in database:
-        properties = page.get('properties', {})
-        row_data = {'page_id': page['id']}  # Add page ID to row data
-        
-        for col_name in column_names:
-            if col_name in properties:
-                row_data[col_name] = extract_property_value(properties[col_name])
-            else:
-                row_data[col_name] = ''
-        
-        # Always extract created_time
-        row_data[CREATED_TIME_COLUMN_NAME] = properties[CREATED_TIME_COLUMN_NAME]['date']['start']
-        
-        data.append(row_data)
+    data = [extract_page_row(page, column_names) for page in database]
     
     # Create DataFrame
     df = pd.DataFrame(data)
     
     if df.empty:
-        return pd.DataFrame(columns=['page_id'] + column_names + [CREATED_TIME_COLUMN_NAME])
+        return pd.DataFrame(columns=['page_id'] + column_names + [CREATED_TIME_COLUMN_NAME] + SRS_COLUMN_NAMES
+                            + [LAST_EDITED_TIME_COLUMN_NAME])
         
     return df
 
 
+def extract_page_row(page, column_names):
+    """
+    Extract one DataFrame row from a Notion page
+    Args:
+        page: Notion page object
+        column_names: List of column names to extract from the page
+    Returns:
+        dict: Row data with page_id, the columns, created_time, the spaced-repetition state and last_edited_time
+    """
+    properties = page.get('properties', {})
+    row_data = {'page_id': page['id']}  # Add page ID to row data
+    
+    for col_name in column_names:
+        if col_name in properties:
+            row_data[col_name] = extract_property_value(properties[col_name])
+        else:
+            row_data[col_name] = ''
+    
+    # Always extract created_time
+    row_data[CREATED_TIME_COLUMN_NAME] = properties[CREATED_TIME_COLUMN_NAME]['date']['start']
+    
+    # Always extract the spaced-repetition state (empty if the properties don't exist)
+    row_data.update(extract_schedule_state(properties))
+    
+    row_data[LAST_EDITED_TIME_COLUMN_NAME] = page.get('last_edited_time')
+    return row_data
+
+
 def filter_by_recent_days(df: pd.DataFrame, days: int) -> pd.DataFrame:
     """
     Filter DataFrame to only include words created within the last k days
@@ -183,7 +234,8 @@ def filter_by_recent_days(df: pd.DataFrame, days: int) -> pd.DataFrame:
     return df[df[CREATED_TIME_COLUMN_NAME] >= cutoff_date]
 
 
-def get_random_pages(df: pd.DataFrame, n_from_full: int, n_from_recent: int = 0, days: int = None) -> pd.DataFrame:
+def get_random_pages(df: pd.DataFrame, n_from_full: int, n_from_recent: int = 0, days: int = None,
+                     weights: pd.Series = None) -> pd.DataFrame:
     """
     Get random pages from the DataFrame, combining samples from both the full database
     and a date-filtered subset. The probability of selection is proportional to the
@@ -194,16 +246,28 @@ def get_random_pages(df: pd.DataFrame, n_from_full: int, n_from_recent: int = 0,
         n_from_full: Number of random pages to select from full database
         n_from_recent: Number of random pages to select from recent subset (default: 0)
         days: Optional number of days to filter by for the subset
+        weights: Optional extra weights indexed by page_id that multiply the Multiplicity
+            (pages without a weight keep their Multiplicity)
         
     Returns:
         DataFrame containing randomly selected pages
     """
+    columns = ['page_id', WORD_COLUMN_NAME, MEANING_COLUMN_NAME, MULTIPLICITY_COLUMN_NAME]
+    if SOURCE_COLUMN_NAME in df.columns:
+        columns.append(SOURCE_COLUMN_NAME)
+    
+    def selection_probabilities(pages: pd.DataFrame) -> pd.Series:
+        priority = pages[MULTIPLICITY_COLUMN_NAME]
+        if weights is not None:
+            priority = priority * pages['page_id'].map(weights).fillna(1.0)
+        return priority / priority.sum()
+    
     # Get random pages from full database
     full_indices = np.random.choice(
         len(df),
         size=min(n_from_full, len(df)),
         replace=False,
-        p=df[MULTIPLICITY_COLUMN_NAME] / df[MULTIPLICITY_COLUMN_NAME].sum()
+        p=selection_probabilities(df)
     )
     full_selection = df.iloc[full_indices]
     
@@ -215,7 +279,7 @@ def get_random_pages(df: pd.DataFrame, n_from_full: int, n_from_recent: int = 0,
                 len(recent_df),
                 size=min(n_from_recent, len(recent_df)),
                 replace=False,
-                p=recent_df[MULTIPLICITY_COLUMN_NAME] / recent_df[MULTIPLICITY_COLUMN_NAME].sum()
+                p=selection_probabilities(recent_df)
             )
             recent_selection = recent_df.iloc[recent_indices]
             
@@ -225,10 +289,10 @@ def get_random_pages(df: pd.DataFrame, n_from_full: int, n_from_recent: int = 0,
             # Shuffle the combined DataFrame
             combined_df = combined_df.sample(frac=1, ignore_index=True)
             
-            return combined_df[['page_id', WORD_COLUMN_NAME, MEANING_COLUMN_NAME, MULTIPLICITY_COLUMN_NAME]]
+            return combined_df[columns]
     
     # If no days specified, n_from_recent is 0, or recent subset is empty, return only full selection
-    return full_selection[['page_id', WORD_COLUMN_NAME, MEANING_COLUMN_NAME, MULTIPLICITY_COLUMN_NAME]]
+    return full_selection[columns]
 
 
 def get_prompt(df: pd.DataFrame) -> str:
@@ -261,45 +325,79 @@ def get_prompt(df: pd.DataFrame) -> str:
     return final_prompt
 
 
-def update_word_multiplicity(notion: Client, page_id: str, current_multiplicity: int, decrease: bool = False) -> bool:
+def edit_time_changed(remote_edited_time, known_edited_time) -> bool:
+    """Whether a page's last_edited_time differs from the one seen locally (unknown times never conflict)"""
+    remote = pd.to_datetime(remote_edited_time, utc=True, errors='coerce')
+    known = pd.to_datetime(known_edited_time, utc=True, errors='coerce')
+    if pd.isna(remote) or pd.isna(known):
+        return False
+    return remote != known
+
+
+def apply_multiplicity_delta(notion: Client, page_id: str, delta: int, known_edited_time=None,
+                             property_name: str = MULTIPLICITY_COLUMN_NAME) -> Optional[Dict[str, Any]]:
     """
-    Update the multiplicity of a word in the Notion database.
+    Change the multiplicity of a word by a delta, starting from its current value in Notion.
+    The page is retrieved first, so changes made by other devices since the database
+    was loaded are kept instead of being overwritten. Stored values never go below 0.
     
     Args:
         notion: Notion client
         page_id: ID of the Notion page to update
-        current_multiplicity: Current multiplicity value (already incremented/decremented by 1 from extract_property_value)
-        decrease: If True, decrease multiplicity by 1, otherwise increase by 1
+        delta: Change of the stored multiplicity (e.g. +1 after a mistake, -1 after a correct answer)
+        known_edited_time: last_edited_time of the local copy of the page; if the page was
+            edited since, the result reports a conflict so the caller can merge the page
+        property_name: Name of the Multiplicity property in the page's database
         
     Returns:
-        bool: True if update was successful, False otherwise
+        Dict with 'multiplicity' (the new value, +1 as from extract_property_value), 'page'
+        (the page after the update) and 'conflict', or None if the update failed
     """
-    # logger = setup_logger()
+    try:
+        page = notion.pages.retrieve(page_id=page_id)
+        conflict = edit_time_changed(page.get('last_edited_time'), known_edited_time)
+        
+        current = int(page['properties'].get(property_name, {}).get('number') or 0)
+        new_value = max(0, current + delta)
+        if new_value != current:
+            page = notion.pages.update(
+                page_id=page_id,
+                properties={
+                    property_name: {
+                        "number": new_value
+                    }
+                }
+            )
+        return {'multiplicity': new_value + 1, 'page': page, 'conflict': conflict}
+    except Exception as e:
+        return None
+
+
+def update_word_schedule(notion: Client, page_id: str, interval: float, ease: float, repetitions: int,
+                         due: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Store the spaced-repetition state of a word in the Notion database.
     
+    Args:
+        notion: Notion client
+        page_id: ID of the Notion page to update
+        interval: Days until the next review
+        ease: SM-2 easiness factor
+        repetitions: Number of successful reviews in a row
+        due: Next review time (naive UTC)
+        
+    Returns:
+        The updated page, or None if the update failed
+    """
     try:
-        # Update the page
-        notion.pages.update(
+        return notion.pages.update(
             page_id=page_id,
             properties={
-                "Multiplicity": {
-                    "number": int(current_multiplicity)  # No need to add/subtract 1 as it's already done
-                }
+                SRS_INTERVAL_COLUMN_NAME: {"number": float(interval)},
+                SRS_EASE_COLUMN_NAME: {"number": round(float(ease), 3)},
+                SRS_REPETITIONS_COLUMN_NAME: {"number": int(repetitions)},
+                SRS_DUE_COLUMN_NAME: {"date": {"start": due.replace(tzinfo=timezone.utc).isoformat(timespec='seconds')}}
             }
         )
-        
-        # # Verify the update by fetching the updated page
-        # updated_page = notion.pages.retrieve(page_id=page_id)
-        # updated_multiplicity = updated_page['properties']['Multiplicity']['number']
-        # 
-        # # Compare the updated value with what we tried to set
-        # if updated_multiplicity != current_multiplicity:
-        #     logger.warning(f"Multiplicity update verification failed. Expected: {current_multiplicity}, Got: {updated_multiplicity}")
-        #     return False
-            
-        # logger.info(f"Successfully updated multiplicity for page {page_id} to {current_multiplicity}")
-        return True
     except Exception as e:
-        # Get the full traceback
-        # error_traceback = traceback.format_exc()
-        # logger.error(f"Error updating multiplicity:\n{error_traceback}")
-        return False
+        return None
@@ -0,0 +1,394 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+import shutil
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+
+DEFAULT_ANALYTICS_DIR = os.path.join('cache', 'answers')
+DEFAULT_COMPACT_EVERY = 1000  # Journal records per columnar segment
+MAX_SEGMENTS = 16  # Segments are merged into one beyond this
+CHUNK_SIZE = 1 << 20  # Records per chunk when merging segments
+
+# One answer event; page and quiz_type are codes into the log's dictionaries
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),  # Milliseconds since the epoch (UTC)
+    ('page', '<i4'),
+    ('response_time', '<f4'),  # Seconds
+    ('correct', 'u1'),
+    ('quiz_type', 'u1'),
+])
+COLUMNS = RECORD_DTYPE.names
+
+JOURNAL_PATTERN = re.compile(r'^journal-(\d+)\.bin$')
+SEGMENT_PATTERN = re.compile(r'^segment-(\d+)$')
+MERGE_PATTERN = re.compile(r'^segment-(\d+)\.merge$')
+MS_PER_DAY = 86_400_000
+
+
+class Dictionary:
+    """Append-only text file mapping strings (page IDs, quiz types) to integer codes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file.read().splitlines():
+                    self.codes.setdefault(line, len(self.values))
+                    self.values.append(line)
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(value + '\n')
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+
+class AnswerLog:
+    """
+    Append-only log of answer events with per-word aggregate queries.
+
+    New events are appended as fixed-width records to a journal file. Once the
+    journal holds compact_every records, compact() (run off the UI thread)
+    starts a new journal, rewrites the full one as a columnar segment (one .npy
+    file per column) and merges the segments into one once there are more than
+    MAX_SEGMENTS. The files are written without holding the lock, so appends
+    only wait for the final renames. Queries stream over the memory-mapped
+    segments and the journals, so the history is never loaded into memory as a
+    whole, and the aggregates of the immutable segments are cached.
+
+    A journal and the segment made from it share a sequence number, so a
+    compaction interrupted by a crash is finished (or its leftover journal
+    removed) the next time the log is opened. Likewise, a merged segment is
+    complete before it replaces the segments it was made from, and a merge
+    interrupted after that point is finished on open.
+    """
+
+    def __init__(self, directory: str = DEFAULT_ANALYTICS_DIR, compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.lock = threading.Lock()  # Guards the journal and the files queries read
+        self.compaction_lock = threading.Lock()  # Only one compaction at a time
+        self.compaction_pending = False  # Whether append has asked for a compaction
+        self.sealed: List[int] = []  # Full journals whose segment is being written
+        os.makedirs(directory, exist_ok=True)
+        self.pages = Dictionary(os.path.join(directory, 'pages.txt'))
+        self.quiz_types = Dictionary(os.path.join(directory, 'quiz_types.txt'))
+        self.segment_totals: Dict[str, Dict[str, np.ndarray]] = {}  # Cached per-page sums of each segment
+        self.segment_days: Dict[str, Dict[int, np.ndarray]] = {}  # Cached per-day counts of each segment
+
+        self._finish_merges()
+        segments = set(self._list(SEGMENT_PATTERN))
+        journals = sorted(self._list(JOURNAL_PATTERN))
+        for sequence in journals[:-1]:
+            self._finish_compaction(sequence, segments)
+        if journals and journals[-1] in segments:
+            self._finish_compaction(journals[-1], segments)
+            journals = journals[:-1]
+        self.sequence = journals[-1] if journals else max(segments, default=0) + 1
+        self.journal = open(self._journal_path(self.sequence), 'ab')
+        self.journal_records = self.journal.tell() // RECORD_DTYPE.itemsize
+
+    def _list(self, pattern: re.Pattern) -> List[int]:
+        return [int(match.group(1)) for match in map(pattern.match, os.listdir(self.directory)) if match]
+
+    def _journal_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f'journal-{sequence:06d}.bin')
+
+    def _segment_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f'segment-{sequence:06d}')
+
+    def _segments(self) -> List[str]:
+        return [self._segment_path(sequence) for sequence in sorted(self._list(SEGMENT_PATTERN))]
+
+    def _read_journal(self, path: str) -> np.ndarray:
+        # Ignore a partially written last record
+        n_records = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        return np.fromfile(path, dtype=RECORD_DTYPE, count=n_records)
+
+    def _write_segment(self, path: str, columns: Dict[str, np.ndarray]):
+        """Write the columns to a temporary directory and move it into place"""
+        os.replace(self._stage_segment(path, columns), path)
+
+    def _stage_segment(self, path: str, columns: Dict[str, np.ndarray]) -> str:
+        """Write the columns to a temporary directory next to path and return it"""
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, values in columns.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), values)
+        return tmp_path
+
+    def _finish_compaction(self, sequence: int, segments: set):
+        if sequence not in segments:
+            records = self._read_journal(self._journal_path(sequence))
+            self._write_segment(self._segment_path(sequence), {name: records[name] for name in COLUMNS})
+            segments.add(sequence)
+        os.remove(self._journal_path(sequence))
+
+    def append(self, page_id: str, correct: bool, response_time: float, quiz_type: str,
+               timestamp: datetime = None):
+        """
+        Record one answer.
+
+        Args:
+            page_id: Page ID of the asked word
+            correct: Whether the answer was accepted
+            response_time: Seconds from showing the question to submitting the answer
+            quiz_type: Name of the quiz type
+            timestamp: Answer time (default: now)
+
+        Returns:
+            True once the journal is full and compact() should be run (only once per journal)
+        """
+        timestamp = timestamp or datetime.now(timezone.utc)
+        record = np.zeros(1, dtype=RECORD_DTYPE)
+        with self.lock:
+            record['timestamp'] = int(timestamp.timestamp() * 1000)
+            record['page'] = self.pages.code(page_id)
+            record['response_time'] = response_time
+            record['correct'] = bool(correct)
+            record['quiz_type'] = self.quiz_types.code(quiz_type)
+            self.journal.write(record.tobytes())
+            self.journal.flush()
+            self.journal_records += 1
+            if self.journal_records >= self.compact_every and not self.compaction_pending:
+                self.compaction_pending = True
+                return True
+        return False
+
+    def compact(self):
+        """
+        Turn the journal into a segment and merge the segments if there are too many.
+        This reads and writes whole files, so run it off the UI thread.
+        """
+        with self.compaction_lock:
+            with self.lock:
+                self.compaction_pending = False
+                if self.journal.closed or not self.journal_records:
+                    return
+                # Seal the full journal; queries keep reading it until its segment is in place
+                sequence = self.sequence
+                self.journal.close()
+                self.sealed.append(sequence)
+                self.sequence += 1
+                self.journal = open(self._journal_path(self.sequence), 'ab')
+                self.journal_records = 0
+
+            records = self._read_journal(self._journal_path(sequence))
+            staged = self._stage_segment(self._segment_path(sequence), {name: records[name] for name in COLUMNS})
+            with self.lock:
+                os.replace(staged, self._segment_path(sequence))
+                os.remove(self._journal_path(sequence))
+                self.sealed.remove(sequence)
+
+            segments = self._segments()
+            if len(segments) > MAX_SEGMENTS:
+                self._merge_segments(segments)
+
+    def _merge_segments(self, segments: List[str]):
+        """
+        Merge all segments into the newest one. The merged segment is written
+        next to them and moved into place before they are removed.
+        """
+        merged = segments[-1] + '.merge'
+        self._write_merged(segments, merged + '.tmp')
+        os.replace(merged + '.tmp', merged)
+        with self.lock:
+            self._replace_segments(segments, merged, segments[-1])
+            self.segment_totals.clear()
+            self.segment_days.clear()
+        self._remove_leftovers()
+
+    def _write_merged(self, segments: List[str], path: str):
+        """
+        Concatenate the segments into path, copying chunk by chunk through memory maps.
+        Every map of the sources is released on return, as Windows refuses to delete mapped files.
+        """
+        sources = [self._load_segment(segment) for segment in segments]
+        n_records = sum(len(source['timestamp']) for source in sources)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        for name in COLUMNS:
+            merged = np.lib.format.open_memmap(
+                os.path.join(path, f'{name}.npy'), mode='w+', dtype=RECORD_DTYPE[name], shape=(n_records,)
+            )
+            position = 0
+            for source in sources:
+                for start in range(0, len(source[name]), CHUNK_SIZE):
+                    chunk = source[name][start:start + CHUNK_SIZE]
+                    merged[position:position + len(chunk)] = chunk
+                    position += len(chunk)
+            merged.flush()
+            del merged
+
+    def _replace_segments(self, segments: List[str], merged: str, target: str):
+        """Set the replaced segments aside as .old (no longer listed by queries) and move the merged one in"""
+        for path in segments:
+            os.replace(path, path + '.old')
+        os.replace(merged, target)
+
+    def _finish_merges(self):
+        """Finish merges whose merged segment was complete when the app stopped"""
+        for sequence in self._list(MERGE_PATTERN):
+            replaced = [self._segment_path(s) for s in sorted(self._list(SEGMENT_PATTERN)) if s <= sequence]
+            self._replace_segments(replaced, self._segment_path(sequence) + '.merge', self._segment_path(sequence))
+        self._remove_leftovers()
+
+    def _remove_leftovers(self):
+        """Remove replaced segments and unfinished temporary directories"""
+        for name in os.listdir(self.directory):
+            if name.endswith(('.old', '.tmp')):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _load_segment(self, path: str) -> Dict[str, np.ndarray]:
+        return {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in COLUMNS}
+
+    def _load_journal(self, sequence: int) -> Dict[str, np.ndarray]:
+        records = self._read_journal(self._journal_path(sequence))
+        return {name: records[name] for name in COLUMNS}
+
+    def _journal_chunks(self) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield the sealed journals and the current journal as column dicts"""
+        for sequence in self.sealed:
+            yield self._load_journal(sequence)
+        if self.journal_records:
+            yield self._load_journal(self.sequence)
+
+    def _slices(self, chunk: Dict[str, np.ndarray]) -> Iterator[Dict[str, np.ndarray]]:
+        """Split a column dict into CHUNK_SIZE records, so that queries never convert a whole column"""
+        for start in range(0, len(chunk['timestamp']), CHUNK_SIZE):
+            yield {name: np.asarray(values[start:start + CHUNK_SIZE]) for name, values in chunk.items()}
+
+    def _page_totals(self, chunk: Dict[str, np.ndarray], n_pages: int) -> Dict[str, np.ndarray]:
+        totals = {name: np.zeros(n_pages) for name in ('answers', 'correct', 'response_time')}
+        for part in self._slices(chunk):
+            pages = part['page']
+            totals['answers'] += np.bincount(pages, minlength=n_pages)
+            totals['correct'] += np.bincount(pages, weights=part['correct'], minlength=n_pages)
+            totals['response_time'] += np.bincount(pages, weights=part['response_time'], minlength=n_pages)
+        return totals
+
+    def _day_totals(self, chunk: Dict[str, np.ndarray]) -> Dict[int, np.ndarray]:
+        """Number of answers and correct answers per day number"""
+        totals = {}
+        for part in self._slices(chunk):
+            day_numbers, inverse = np.unique(part['timestamp'] // MS_PER_DAY, return_inverse=True)
+            day_answers = np.bincount(inverse, minlength=len(day_numbers))
+            day_correct = np.bincount(inverse, weights=part['correct'], minlength=len(day_numbers))
+            for day, n_answers, n_correct in zip(day_numbers.tolist(), day_answers, day_correct):
+                totals[day] = totals.get(day, 0) + np.array([n_answers, n_correct], dtype=np.int64)
+        return totals
+
+    def word_stats(self) -> pd.DataFrame:
+        """
+        Per-word answer statistics over the whole history.
+
+        Returns:
+            DataFrame indexed by page_id with columns answers, correct, accuracy
+            and mean_response_time (words never answered are not included)
+        """
+        with self.lock:
+            self.journal.flush()
+            n_pages = len(self.pages)
+            totals = {name: np.zeros(n_pages) for name in ('answers', 'correct', 'response_time')}
+            parts = []
+            for path in self._segments():
+                if path not in self.segment_totals:
+                    self.segment_totals[path] = self._page_totals(self._load_segment(path), n_pages)
+                parts.append(self.segment_totals[path])
+            for chunk in self._journal_chunks():
+                parts.append(self._page_totals(chunk, n_pages))
+            for part in parts:
+                for name, values in part.items():
+                    totals[name][:len(values)] += values
+            page_ids = list(self.pages.values)
+
+        answered = totals['answers'] > 0
+        answers = totals['answers'][answered]
+        return pd.DataFrame({
+            'answers': answers.astype(np.int64),
+            'correct': totals['correct'][answered].astype(np.int64),
+            'accuracy': totals['correct'][answered] / answers,
+            'mean_response_time': totals['response_time'][answered] / answers,
+        }, index=pd.Index(np.array(page_ids, dtype=object)[answered], name='page_id'))
+
+    def daily_volume(self, days: int = None) -> pd.DataFrame:
+        """
+        Number of answers and correct answers per day (UTC).
+
+        Args:
+            days: Only count the last days days (default: the whole history)
+
+        Returns:
+            DataFrame indexed by date with columns answers and correct
+        """
+        first_day = None
+        if days is not None:
+            first_day = int(datetime.now(timezone.utc).timestamp() * 1000) // MS_PER_DAY - days + 1
+        counts = {}
+        with self.lock:
+            self.journal.flush()
+            parts = []
+            for path in self._segments():
+                if path not in self.segment_days:
+                    self.segment_days[path] = self._day_totals(self._load_segment(path))
+                parts.append(self.segment_days[path])
+            for chunk in self._journal_chunks():
+                parts.append(self._day_totals(chunk))
+            for part in parts:
+                for day, values in part.items():
+                    if first_day is None or day >= first_day:
+                        counts[day] = counts.get(day, 0) + values
+
+        day_numbers = sorted(counts)
+        return pd.DataFrame({
+            'answers': [int(counts[day][0]) for day in day_numbers],
+            'correct': [int(counts[day][1]) for day in day_numbers],
+        }, index=pd.Index(pd.to_datetime(np.array(day_numbers, dtype=np.int64), unit='D').date, name='date'))
+
+    def slowest_words(self, n: int = 10, min_answers: int = 1) -> pd.DataFrame:
+        """The n words with the highest mean response time, among words answered at least min_answers times"""
+        stats = self.word_stats()
+        stats = stats[stats['answers'] >= min_answers]
+        return stats.sort_values('mean_response_time', ascending=False).head(n)
+
+    def close(self):
+        with self.lock:
+            self.journal.close()
+
+
+def selection_weights(stats: pd.DataFrame, accuracy_weight: float = 0.0,
+                      speed_weight: float = 0.0) -> Optional[pd.Series]:
+    """
+    Turn per-word answer statistics into extra selection weights for get_random_pages.
+    A word's weight is 1 + accuracy_weight * error rate + speed_weight * how much slower
+    than the median its mean response time is (capped at 2x the median).
+
+    Args:
+        stats: Output of AnswerLog.word_stats
+        accuracy_weight: Boost for words that are often answered wrong
+        speed_weight: Boost for words that are answered slowly
+
+    Returns:
+        Series of weights indexed by page_id, or None if both weights are 0
+    """
+    if (accuracy_weight <= 0 and speed_weight <= 0) or stats.empty:
+        return None
+    weights = 1 + accuracy_weight * (1 - stats['accuracy'])
+    median_time = stats['mean_response_time'].median()
+    if speed_weight > 0 and median_time > 0:
+        weights += speed_weight * (stats['mean_response_time'] / median_time - 1).clip(0, 2)
+    return weights.rename('weight')
@@ -0,0 +1,209 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+
+EXACT = 'exact'
+NEAR_MISS = 'near_miss'
+KNOWN_WORD = 'known_word'
+WRONG = 'wrong'
+
+
+class MatchResult(NamedTuple):
+    kind: str  # One of EXACT, NEAR_MISS, KNOWN_WORD, WRONG
+    matched_word: Optional[str] = None  # Vocabulary word the answer was matched to
+    distance: int = 0  # Edit distance between the answer and matched_word
+
+
+def normalize_lemma(word: str) -> str:
+    """
+    Reduce a word to a simple lemma key by stripping common English inflections,
+    e.g. "studies"/"studied" -> "study", "running" -> "run", "making"/"make" -> "mak".
+    The key is only used for comparisons and is not always a real word.
+
+    Args:
+        word: Word to normalize
+
+    Returns:
+        Lemma key
+    """
+    w = word.strip().lower()
+    stripped = True
+    if len(w) > 4 and w.endswith(('ies', 'ied')):
+        w = w[:-3] + 'y'
+    else:
+        # Plurals first, so that "meetings" is reduced like "meeting"
+        if len(w) > 4 and w.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+            w = w[:-2]
+        elif len(w) > 3 and w.endswith('s') and not w.endswith('ss'):
+            w = w[:-1]
+        else:
+            stripped = False
+        if len(w) > 5 and w.endswith('ing'):
+            w = w[:-3]
+        elif len(w) > 4 and w.endswith('ed'):
+            w = w[:-2]
+        elif not stripped:
+            return w[:-1] if len(w) > 3 and w.endswith('e') else w
+
+    # Undo consonant doubling ("running" -> "runn" -> "run")
+    if len(w) > 3 and w[-1] == w[-2] and w[-1] not in 'aeiouls':
+        w = w[:-1]
+    return w[:-1] if len(w) > 3 and w.endswith('e') else w
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions),
+    with early exit once every cell of a row exceeds max_distance.
+
+    Returns:
+        The distance, or max_distance + 1 if it exceeds max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def meaning_senses(meaning: str) -> Set[str]:
+    """Split a meaning into normalized senses, e.g. "사과, 사죄" -> {"사과", "사죄"}"""
+    senses = (' '.join(sense.split()).strip(' .!?') for sense in re.split(r'[,;/\n]', str(meaning).lower()))
+    return {sense for sense in senses if sense}
+
+
+def typo_tolerance(word: str) -> int:
+    """Number of edits accepted as a typo for a word of this length"""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 7:
+        return 1
+    return 2
+
+
+def deletes(word: str) -> Set[str]:
+    """All strings obtained by deleting one character of word"""
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class AnswerMatcher:
+    """
+    Classify quiz answers against the vocabulary.
+
+    The index is built once per vocabulary load: a lemma table for exact and
+    inflected lookups, the senses of each lemma's meanings, and a
+    symmetric-delete table (every lemma and its single-character deletions) for
+    typo lookups. Looking up a typo then only needs the deletions of the answer
+    and a few edit-distance checks on the candidates, instead of a scan or tree
+    walk over the vocabulary.
+    """
+
+    def __init__(self, words: Iterable[str], meanings: Iterable[str] = None):
+        self.lemmas: Dict[str, Set[str]] = {}
+        self.senses: Dict[str, Set[str]] = {}  # Meaning senses of each lemma
+        self.delete_index: Dict[str, List[str]] = {}
+        words = list(words)
+        meanings = [''] * len(words) if meanings is None else list(meanings)
+        for word, meaning in zip(words, meanings):
+            word = str(word).strip()
+            if not word:
+                continue
+            lemma = normalize_lemma(word)
+            self.senses.setdefault(lemma, set()).update(meaning_senses(meaning) if isinstance(meaning, str) else ())
+            if lemma in self.lemmas:
+                self.lemmas[lemma].add(word)
+                continue
+            self.lemmas[lemma] = {word}
+            index = self.delete_index
+            for key in deletes(lemma) | {lemma}:
+                if key in index:
+                    index[key].append(lemma)
+                else:
+                    index[key] = [lemma]
+
+    def closest(self, answer: str) -> List[MatchResult]:
+        """
+        Find vocabulary words within typo tolerance of the answer.
+
+        Args:
+            answer: User answer
+
+        Returns:
+            List of KNOWN_WORD results sorted by edit distance
+        """
+        lemma = normalize_lemma(answer)
+        max_distance = max(typo_tolerance(lemma), 1)
+        candidates = set(self.delete_index.get(lemma, ()))
+        for deleted in deletes(lemma):
+            candidates.update(self.delete_index.get(deleted, ()))
+
+        matches = []
+        for candidate in candidates:
+            distance = edit_distance(lemma, candidate, max_distance)
+            if distance <= max_distance:
+                for word in self.lemmas[candidate]:
+                    matches.append(MatchResult(KNOWN_WORD, word, distance))
+        return sorted(matches, key=lambda match: (match.distance, match.matched_word))
+
+    def fits(self, lemma: str, correct_lemma: str) -> bool:
+        """Whether a vocabulary word shares a meaning with the expected word, so that it fits the question too"""
+        return bool(self.senses.get(lemma, set()) & self.senses.get(correct_lemma, set()))
+
+    def classify(self, answer: str, correct_answer: str, allow_known_word: bool = True) -> MatchResult:
+        """
+        Classify an answer as exact, near-miss (typo or inflection of the correct
+        answer), another vocabulary word with the same meaning (possibly with a
+        typo), or wrong.
+
+        Args:
+            answer: User answer
+            correct_answer: Expected answer
+            allow_known_word: Whether a word with the same meaning may be excused,
+                e.g. not for multiple-choice questions where every option is a vocabulary word
+
+        Returns:
+            MatchResult
+        """
+        answer = answer.strip().lower()
+        correct = correct_answer.strip().lower()
+        if answer == correct:
+            return MatchResult(EXACT, correct_answer, 0)
+        if not answer:
+            return MatchResult(WRONG)
+
+        answer_lemma = normalize_lemma(answer)
+        correct_lemma = normalize_lemma(correct)
+        if answer_lemma == correct_lemma:
+            return MatchResult(NEAR_MISS, correct_answer, edit_distance(answer, correct, max(len(answer), len(correct))))
+
+        # A different vocabulary word is only excused if it has the same meaning
+        known = self.lemmas.get(answer_lemma)
+        if known:
+            if allow_known_word and self.fits(answer_lemma, correct_lemma):
+                return MatchResult(KNOWN_WORD, sorted(known)[0], 0)
+            return MatchResult(WRONG)
+
+        max_distance = typo_tolerance(correct)
+        distance = edit_distance(answer_lemma, correct_lemma, max_distance)
+        if distance <= max_distance:
+            return MatchResult(NEAR_MISS, correct_answer, distance)
+        if not allow_known_word:
+            return MatchResult(WRONG)
+
+        # So is a typo of one
+        for match in self.closest(answer):
+            if match.distance > typo_tolerance(answer):
+                break
+            if self.fits(normalize_lemma(match.matched_word), correct_lemma):
+                return match
+        return MatchResult(WRONG)
@@ -0,0 +1,178 @@
+import pandas as pd
+import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+from Notion import (get_notion_database, create_word_dataframe, extract_page_row, get_random_pages,
+                    WORD_COLUMN_NAME, MEANING_COLUMN_NAME, MULTIPLICITY_COLUMN_NAME, SOURCE_COLUMN_NAME)
+
+
+DEFAULT_DECK_NAME = "Default"
+
+
+def get_deck_configs(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Read the list of vocabulary databases ("decks") from config.json.
+
+    Each entry of NOTION_DATABASES may set NAME, DATABASE_ID, WORD_COLUMN_NAME,
+    MEANING_COLUMN_NAME, MULTIPLICITY_COLUMN_NAME and QUOTA. Without
+    NOTION_DATABASES, the single NOTION_DATABASE_ID is used as one deck.
+
+    Args:
+        config: Parsed config.json
+
+    Returns:
+        List of deck dicts with every key filled in (QUOTA may be None)
+    """
+    entries = config.get('NOTION_DATABASES') or [{'DATABASE_ID': config.get('NOTION_DATABASE_ID')}]
+    decks = []
+    for i, entry in enumerate(entries):
+        decks.append({
+            'NAME': entry.get('NAME') or (DEFAULT_DECK_NAME if len(entries) == 1 else f"Deck {i + 1}"),
+            'DATABASE_ID': entry['DATABASE_ID'],
+            'WORD_COLUMN_NAME': entry.get('WORD_COLUMN_NAME', WORD_COLUMN_NAME),
+            'MEANING_COLUMN_NAME': entry.get('MEANING_COLUMN_NAME', MEANING_COLUMN_NAME),
+            'MULTIPLICITY_COLUMN_NAME': entry.get('MULTIPLICITY_COLUMN_NAME', MULTIPLICITY_COLUMN_NAME),
+            'QUOTA': entry.get('QUOTA'),
+        })
+    names = [deck['NAME'] for deck in decks]
+    if len(set(names)) != len(names):
+        raise ValueError("Deck names in NOTION_DATABASES must be unique")
+    return decks
+
+
+def get_decks_signature(decks: List[Dict[str, Any]]) -> str:
+    """Identify a deck configuration (databases and column mappings), e.g. to validate a snapshot"""
+    return "|".join(
+        f"{deck['NAME']}:{deck['DATABASE_ID']}:{deck['WORD_COLUMN_NAME']}:"
+        f"{deck['MEANING_COLUMN_NAME']}:{deck['MULTIPLICITY_COLUMN_NAME']}"
+        for deck in decks
+    )
+
+
+def load_deck(notion_api_key: str, deck: Dict[str, Any], progress_callback: Callable[[int], None] = None,
+              cancel_event: threading.Event = None) -> pd.DataFrame:
+    """
+    Load one deck and map its columns to the standard Word/Meaning/Multiplicity names.
+
+    Returns:
+        DataFrame tagged with the deck name in the source column
+    """
+    database = get_notion_database(
+        notion_api_key,
+        deck['DATABASE_ID'],
+        progress_callback=progress_callback,
+        cancel_event=cancel_event
+    )
+    df = create_word_dataframe(database, get_deck_columns(deck))
+    df = df.rename(columns=get_deck_column_mapping(deck))
+    df[SOURCE_COLUMN_NAME] = deck['NAME']
+    return df
+
+
+def get_deck_columns(deck: Dict[str, Any]) -> List[str]:
+    return [deck['WORD_COLUMN_NAME'], deck['MEANING_COLUMN_NAME'], deck['MULTIPLICITY_COLUMN_NAME']]
+
+
+def get_deck_column_mapping(deck: Dict[str, Any]) -> Dict[str, str]:
+    """Map the deck's property names to the standard column names"""
+    return {
+        deck['WORD_COLUMN_NAME']: WORD_COLUMN_NAME,
+        deck['MEANING_COLUMN_NAME']: MEANING_COLUMN_NAME,
+        deck['MULTIPLICITY_COLUMN_NAME']: MULTIPLICITY_COLUMN_NAME,
+    }
+
+
+def extract_deck_row(page: Dict[str, Any], deck: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract one row of the unified vocabulary from a page of the deck, as load_deck does for every page"""
+    mapping = get_deck_column_mapping(deck)
+    row = {mapping.get(key, key): value for key, value in extract_page_row(page, get_deck_columns(deck)).items()}
+    row[SOURCE_COLUMN_NAME] = deck['NAME']
+    return row
+
+
+def load_decks(notion_api_key: str, decks: List[Dict[str, Any]], progress_callback: Callable[[int], None] = None,
+               cancel_event: threading.Event = None) -> pd.DataFrame:
+    """
+    Load all decks concurrently (one thread per database) and merge them into one vocabulary.
+
+    Args:
+        notion_api_key: Notion API key
+        decks: Deck configs from get_deck_configs
+        progress_callback: Optional callback called with the total number of pages fetched so far
+        cancel_event: Optional event to stop fetching early
+
+    Returns:
+        Unified DataFrame with a source column naming the deck of each word
+    """
+    fetched = {}
+
+    def report(name, count):
+        fetched[name] = count
+        if progress_callback is not None:
+            progress_callback(sum(fetched.values()))
+
+    with ThreadPoolExecutor(max_workers=len(decks)) as executor:
+        futures = [
+            executor.submit(
+                load_deck,
+                notion_api_key,
+                deck,
+                lambda count, name=deck['NAME']: report(name, count),
+                cancel_event
+            )
+            for deck in decks
+        ]
+        frames = [future.result() for future in futures]
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def split_quota(n: int, weights: np.ndarray) -> np.ndarray:
+    """Split n into integer parts proportional to weights (largest remainder method)"""
+    if n <= 0 or weights.sum() <= 0:
+        return np.zeros(len(weights), dtype=int)
+    shares = n * weights / weights.sum()
+    parts = np.floor(shares).astype(int)
+    remainder = n - parts.sum()
+    parts[np.argsort(parts - shares)[:remainder]] += 1
+    return parts
+
+
+def get_deck_pages(df: pd.DataFrame, decks: List[Dict[str, Any]], n_from_full: int, n_from_recent: int = 0,
+                   days: int = None, weights: pd.Series = None) -> pd.DataFrame:
+    """
+    Sample quiz words with per-deck quotas.
+    If no deck sets a QUOTA, words are sampled from the whole vocabulary with
+    get_random_pages. Otherwise both counts are split between decks in
+    proportion to their QUOTA (decks without one get 0) and each deck is
+    sampled separately by Multiplicity.
+
+    Args:
+        df: Unified vocabulary DataFrame with a source column
+        decks: Deck configs from get_deck_configs
+        n_from_full: Number of words from the full vocabulary
+        n_from_recent: Number of words from the recent subset
+        days: Number of days that count as recent
+        weights: Optional extra selection weights indexed by page_id (see get_random_pages)
+
+    Returns:
+        DataFrame of selected pages, including the source column
+    """
+    if all(deck['QUOTA'] is None for deck in decks):
+        return get_random_pages(df, n_from_full, n_from_recent, days, weights)
+
+    quotas = np.array([float(deck['QUOTA'] or 0) for deck in decks])
+    full_parts = split_quota(n_from_full, quotas)
+    recent_parts = split_quota(n_from_recent, quotas)
+
+    frames = []
+    for deck, n_full, n_recent in zip(decks, full_parts, recent_parts):
+        deck_df = df[df[SOURCE_COLUMN_NAME] == deck['NAME']]
+        if deck_df.empty or n_full + n_recent == 0:
+            continue
+        frames.append(get_random_pages(deck_df, int(n_full), int(n_recent), days, weights))
+
+    if not frames:
+        return get_random_pages(df, 0)
+    return pd.concat(frames, ignore_index=True).sample(frac=1, ignore_index=True)
@@ -0,0 +1,272 @@
+import pandas as pd
+import numpy as np
+import threading
+from typing import Dict, List, Sequence
+from Notion import WORD_COLUMN_NAME, MEANING_COLUMN_NAME
+
+
+WORD_NGRAM = 3
+MEANING_NGRAM = 2
+MEANING_MAX_CHARS = 60
+MEANING_WEIGHT = 0.5
+
+
+def extract_features(word: str, meaning: str) -> List[str]:
+    """
+    Extract character n-gram features of a word and its meaning.
+    Word n-grams capture spelling confusion, meaning n-grams capture words
+    with similar meanings. Features are prefixed so the two never collide.
+
+    Args:
+        word: Word text
+        meaning: Meaning text
+
+    Returns:
+        List of features (repeated features count towards term frequency)
+    """
+    padded = f" {word.lower()} "
+    features = ['w:' + padded[i:i + WORD_NGRAM] for i in range(max(len(padded) - WORD_NGRAM + 1, 1))]
+    compact = ''.join(meaning.split())[:MEANING_MAX_CHARS]
+    features += ['m:' + compact[i:i + MEANING_NGRAM] for i in range(len(compact) - MEANING_NGRAM + 1)]
+    return features
+
+
+def expand_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Concatenate the index ranges [start, start + length) without a Python loop.
+    """
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+class DistractorEngine:
+    """
+    Select confusable distractors for multiple-choice questions.
+
+    The vocabulary is kept as a sparse TF-IDF matrix over character n-grams of
+    Word and Meaning, stored as flat NumPy arrays in both row (CSR) and column
+    (CSC) order. Similarities for a batch of targets are computed with a single
+    np.bincount over the matching columns, so a query only touches rows that
+    share at least one n-gram with a target.
+
+    update() and pick() may be called from different threads; they are
+    serialized by a lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Drop all rows and features"""
+        self.page_ids: List[str] = []
+        self.signatures: List[str] = []
+        self.words: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.word_code_of: Dict[str, int] = {}
+        self.word_codes = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.feature_ids: Dict[str, int] = {}
+        self.group_weights = np.zeros(0, dtype=np.float64)
+
+        # COO entries (row, feature, term frequency)
+        self.entry_rows = np.zeros(0, dtype=np.int64)
+        self.entry_features = np.zeros(0, dtype=np.int64)
+        self.entry_tf = np.zeros(0, dtype=np.float64)
+
+        # Normalized TF-IDF matrix in CSR and CSC order
+        self.csr_ptr = np.zeros(1, dtype=np.int64)
+        self.csr_features = np.zeros(0, dtype=np.int64)
+        self.csr_values = np.zeros(0, dtype=np.float64)
+        self.csc_ptr = np.zeros(1, dtype=np.int64)
+        self.csc_rows = np.zeros(0, dtype=np.int64)
+        self.csc_values = np.zeros(0, dtype=np.float64)
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def update(self, df: pd.DataFrame):
+        """
+        Synchronize the matrix with the vocabulary in df.
+        Only added, removed or edited words are processed; unchanged rows keep
+        their entries. The matrix is rebuilt from scratch when more than half of
+        the rows are stale.
+
+        Args:
+            df: DataFrame containing page_id, Word and Meaning columns
+        """
+        with self.lock:
+            self._update(df)
+
+    def _update(self, df: pd.DataFrame):
+        words = df[WORD_COLUMN_NAME].fillna('').astype(str)
+        meanings = df[MEANING_COLUMN_NAME].fillna('').astype(str)
+        signatures = pd.Series((words + '\x1f' + meanings).to_numpy(), index=df['page_id'].to_numpy())
+        signatures = signatures[~signatures.index.duplicated()]
+
+        current = pd.Series(self.signatures, index=self.page_ids, dtype=object)[self.alive]
+        known = signatures.index.isin(current.index)
+        changed = known & (signatures.to_numpy() != current.reindex(signatures.index).to_numpy())
+        removed_ids = current.index[~current.index.isin(signatures.index)].tolist()
+        stale_ids = removed_ids + signatures.index[changed].tolist()
+        added = signatures[~known | changed]
+
+        if stale_ids:
+            stale_rows = np.array([self.row_of.pop(page_id) for page_id in stale_ids], dtype=np.int64)
+            self.alive[stale_rows] = False
+            keep = ~np.isin(self.entry_rows, stale_rows)
+            self.entry_rows = self.entry_rows[keep]
+            self.entry_features = self.entry_features[keep]
+            self.entry_tf = self.entry_tf[keep]
+
+        if len(self.alive) and (~self.alive).sum() > len(self.alive) // 2:
+            self._reset()
+            added = signatures
+
+        if len(added):
+            self._append_rows(added)
+
+        self._rebuild_index()
+
+    def _append_rows(self, signatures: pd.Series):
+        """Extract n-gram features for new rows and append them to the COO entries"""
+        flat_features, lengths, codes = [], [], []
+        start = len(self.page_ids)
+        for page_id, signature in signatures.items():
+            word, meaning = signature.split('\x1f', 1)
+            self.row_of[page_id] = len(self.page_ids)
+            self.page_ids.append(page_id)
+            self.signatures.append(signature)
+            self.words.append(word)
+            codes.append(self.word_code_of.setdefault(word.strip().lower(), len(self.word_code_of)))
+            features = extract_features(word, meaning)
+            flat_features.extend(features)
+            lengths.append(len(features))
+
+        # Map feature strings to global feature IDs, registering unseen ones
+        local_ids, uniques = pd.factorize(pd.Series(flat_features, dtype=object))
+        global_ids = np.array(
+            [self.feature_ids.setdefault(feature, len(self.feature_ids)) for feature in uniques],
+            dtype=np.int64
+        )
+        features = global_ids[local_ids]
+        rows = np.repeat(np.arange(start, len(self.page_ids), dtype=np.int64), lengths)
+
+        # Merge repeated (row, feature) pairs into term frequencies
+        n_features = max(len(self.feature_ids), 1)
+        keys, tfs = np.unique(rows * n_features + features, return_counts=True)
+
+        self.word_codes = np.concatenate([self.word_codes, np.array(codes, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.ones(len(signatures), dtype=bool)])
+        self.entry_rows = np.concatenate([self.entry_rows, keys // n_features])
+        self.entry_features = np.concatenate([self.entry_features, keys % n_features])
+        self.entry_tf = np.concatenate([self.entry_tf, tfs.astype(np.float64)])
+
+        # Meaning features are weighted down relative to spelling features
+        n_new = len(self.feature_ids) - len(self.group_weights)
+        if n_new:
+            new_features = list(self.feature_ids)[len(self.group_weights):]
+            self.group_weights = np.concatenate([
+                self.group_weights,
+                np.array([MEANING_WEIGHT if f.startswith('m:') else 1.0 for f in new_features])
+            ])
+
+    def _rebuild_index(self):
+        """Recompute IDF weights, row norms and the CSR/CSC orderings"""
+        n_rows = len(self.alive)
+        n_features = len(self.feature_ids)
+        n_alive = max(int(self.alive.sum()), 1)
+
+        doc_freq = np.bincount(self.entry_features, minlength=n_features)
+        idf = np.log((1 + n_alive) / (1 + doc_freq)) + 1
+        values = self.entry_tf * idf[self.entry_features] * self.group_weights[self.entry_features]
+        norms = np.sqrt(np.bincount(self.entry_rows, weights=values ** 2, minlength=n_rows))
+        values = values / np.maximum(norms[self.entry_rows], 1e-12)
+
+        order = np.argsort(self.entry_rows, kind='stable')
+        self.csr_ptr = np.concatenate([[0], np.cumsum(np.bincount(self.entry_rows, minlength=n_rows))])
+        self.csr_features = self.entry_features[order]
+        self.csr_values = values[order]
+
+        order = np.argsort(self.entry_features, kind='stable')
+        self.csc_ptr = np.concatenate([[0], np.cumsum(doc_freq)])
+        self.csc_rows = self.entry_rows[order]
+        self.csc_values = values[order]
+
+    def similarities(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Compute cosine similarities between the given rows and the whole vocabulary.
+
+        Args:
+            rows: Row indices of the targets
+
+        Returns:
+            Array of shape (len(rows), n_rows)
+        """
+        n_rows = len(self.alive)
+        rows = np.asarray(rows, dtype=np.int64)
+
+        # Non-zero features of every target
+        target_lengths = self.csr_ptr[rows + 1] - self.csr_ptr[rows]
+        target_entries = expand_ranges(self.csr_ptr[rows], target_lengths)
+        target_batch = np.repeat(np.arange(len(rows)), target_lengths)
+        target_features = self.csr_features[target_entries]
+        target_values = self.csr_values[target_entries]
+
+        # Matching column entries of every target feature
+        column_lengths = self.csc_ptr[target_features + 1] - self.csc_ptr[target_features]
+        column_entries = expand_ranges(self.csc_ptr[target_features], column_lengths)
+        keys = np.repeat(target_batch * n_rows, column_lengths) + self.csc_rows[column_entries]
+        weights = np.repeat(target_values, column_lengths) * self.csc_values[column_entries]
+
+        scores = np.bincount(keys, weights=weights, minlength=len(rows) * n_rows)
+        return scores.reshape(len(rows), n_rows)
+
+    def pick(self, page_ids: Sequence[str], k: int = 3) -> Dict[str, List[str]]:
+        """
+        Pick the k most confusable distractor words for each target page.
+
+        Args:
+            page_ids: Page IDs of the target words
+            k: Number of distractors per target
+
+        Returns:
+            Dict mapping page_id to a list of distractor words (most similar first)
+        """
+        with self.lock:
+            return self._pick(page_ids, k)
+
+    def _pick(self, page_ids: Sequence[str], k: int) -> Dict[str, List[str]]:
+        page_ids = [page_id for page_id in page_ids if page_id in self.row_of]
+        if not page_ids or k <= 0:
+            return {}
+
+        rows = np.array([self.row_of[page_id] for page_id in page_ids], dtype=np.int64)
+        scores = self.similarities(rows)
+
+        # Exclude dead rows and any row spelling the same word as the target
+        scores[:, ~self.alive] = -np.inf
+        scores[self.word_codes[rows][:, None] == self.word_codes[None, :]] = -np.inf
+
+        # Over-fetch so that case variants of one word can be merged below
+        n_fetch = min(2 * k, scores.shape[1])
+        top = np.argpartition(-scores, n_fetch - 1, axis=1)[:, :n_fetch]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        # Keep distinct words only
+        result = {}
+        for page_id, candidates, candidate_scores in zip(page_ids, top, top_scores):
+            distractors, seen = [], set()
+            for row, score in zip(candidates, candidate_scores):
+                word = self.words[row]
+                if np.isfinite(score) and word.lower() not in seen:
+                    seen.add(word.lower())
+                    distractors.append(word)
+            result[page_id] = distractors[:k]
+        return result
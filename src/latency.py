@@ -0,0 +1,37 @@
+import threading
+import numpy as np
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent latencies (in seconds) with percentile queries.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(float(seconds))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th percentile of the window, or None if nothing was recorded yet"""
+        with self.lock:
+            if not self.samples:
+                return None
+            return float(np.percentile(np.fromiter(self.samples, dtype=np.float64), q))
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """p50/p95/p99 of the window"""
+        with self.lock:
+            if not self.samples:
+                return {'p50': None, 'p95': None, 'p99': None, 'count': 0}
+            p50, p95, p99 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 95, 99])
+            return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'count': len(self.samples)}
@@ -0,0 +1,144 @@
+import re
+import pandas as pd
+import numpy as np
+from typing import List, Tuple, Optional, Sequence, Dict
+from Notion import WORD_COLUMN_NAME, MEANING_COLUMN_NAME
+
+
+QUESTION_TYPES = ['reverse', 'cloze', 'first_letter']
+BLANK = "____"
+
+
+def mask_word(text: str, word: str) -> str:
+    """
+    Replace every occurrence of the word (and simple inflections of it) in a text
+    with a blank so that the question does not give away the answer.
+
+    Args:
+        text: Text to mask
+        word: Word to hide
+
+    Returns:
+        Masked text
+    """
+    if not word:
+        return text
+    return re.sub(rf"\b{re.escape(word)}\w*", BLANK, text, flags=re.IGNORECASE)
+
+
+def make_reverse_question(word: str, meaning: str) -> str:
+    return f"What is the word that means '{mask_word(meaning, word)}'?"
+
+
+def make_cloze_question(word: str, meaning: str) -> Optional[str]:
+    """
+    Build a fill-in-the-blank question from example text in the meaning.
+    Returns None if the meaning contains no example using the word.
+    """
+    if not re.search(rf"\b{re.escape(word)}", meaning, flags=re.IGNORECASE):
+        return None
+    return f"Fill in the blank: {mask_word(meaning, word)}"
+
+
+def make_first_letter_question(word: str, meaning: str) -> str:
+    hint = ' '.join([word[0]] + ['_'] * (len(word) - 1))
+    return f"'{mask_word(meaning, word)}' ({len(word)} letters): {hint}"
+
+
+def make_multiple_choice_question(word: str, meaning: str, distractors: Sequence[str],
+                                  rng: np.random.Generator) -> str:
+    options = [word] + list(distractors)
+    options = [options[i] for i in rng.permutation(len(options))]
+    # Options are not numbered: the answer is checked against the typed word
+    choices = "\n".join(f"- {option}" for option in options)
+    return f"Which word means '{mask_word(meaning, word)}'? Type the word.\n{choices}"
+
+
+def generate_multiple_choice_quiz(df: pd.DataFrame, distractors: Dict[str, List[str]],
+                                  rng: np.random.Generator = None) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Generate multiple-choice questions, one per word.
+
+    Args:
+        df: Input DataFrame containing page_id, Word and Meaning columns
+        distractors: Dict mapping page_id to distractor words (see DistractorEngine.pick)
+        rng: Optional random generator
+
+    Returns:
+        List of (question, answer, page_id) tuples; the answer is the word itself
+    """
+    rng = rng or np.random.default_rng()
+    qa_pairs = []
+    for page_id, word, meaning in zip(df['page_id'], df[WORD_COLUMN_NAME], df[MEANING_COLUMN_NAME]):
+        word = str(word).strip()
+        if not word:
+            continue
+        question = make_multiple_choice_question(word, str(meaning), distractors.get(page_id, []), rng)
+        qa_pairs.append((question, word, page_id))
+    return qa_pairs
+
+
+def generate_local_quiz(df: pd.DataFrame, question_types: Sequence[str] = None,
+                        rng: np.random.Generator = None) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Generate a quiz locally, without calling Gemini.
+    One question is made per word, with a type drawn at random from question_types.
+    Cloze questions are only used for words whose meaning contains example text
+    with the word; other words fall back to reverse lookup.
+
+    Args:
+        df: Input DataFrame containing Word and Meaning columns (and optionally page_id)
+        question_types: Question types to draw from (default: all of QUESTION_TYPES)
+        rng: Optional random generator
+
+    Returns:
+        List of (question, answer, page_id) tuples; page_id is None without a page_id column
+    """
+    question_types = list(question_types or QUESTION_TYPES)
+    unknown = set(question_types) - set(QUESTION_TYPES)
+    if unknown:
+        raise ValueError(f"Unsupported question type(s): {sorted(unknown)}")
+    rng = rng or np.random.default_rng()
+
+    words = df[WORD_COLUMN_NAME].fillna('').astype(str).str.strip()
+    meanings = df[MEANING_COLUMN_NAME].fillna('').astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+    chosen = rng.choice(question_types, size=len(df))
+    page_ids = df['page_id'] if 'page_id' in df.columns else [None] * len(df)
+
+    qa_pairs = []
+    for page_id, word, meaning, question_type in zip(page_ids, words, meanings, chosen):
+        if not word:
+            continue
+        question = None
+        if question_type == 'cloze':
+            question = make_cloze_question(word, meaning)
+        elif question_type == 'first_letter':
+            question = make_first_letter_question(word, meaning)
+        if question is None:
+            question = make_reverse_question(word, meaning)
+        qa_pairs.append((question, word, page_id))
+
+    return qa_pairs
+
+
+def mix_quizzes(primary: List[Tuple], local: List[Tuple], ratio: float,
+                rng: np.random.Generator = None) -> List[Tuple]:
+    """
+    Mix locally generated questions into another quiz.
+
+    Args:
+        primary: Questions from the main source (e.g. Gemini)
+        local: Locally generated questions
+        ratio: Fraction of local questions to add, relative to the primary quiz length
+        rng: Optional random generator
+
+    Returns:
+        Shuffled list of quiz items
+    """
+    rng = rng or np.random.default_rng()
+    n_local = min(len(local), int(round(len(primary) * ratio)))
+    if n_local == 0:
+        return list(primary)
+    picked = [local[i] for i in rng.choice(len(local), size=n_local, replace=False)]
+    mixed = list(primary) + picked
+    return [mixed[i] for i in rng.permutation(len(mixed))]
@@ -1,14 +1,29 @@
 import json
 import tkinter as tk
 from tkinter import ttk, messagebox
-from Notion import get_notion_database, create_word_dataframe, get_random_pages, get_prompt, update_word_multiplicity
-from Gemini import generate_gemini_response
-from prompt_parser import parse_qa_pairs
+from Notion import (apply_multiplicity_delta, update_word_schedule, SRS_INTERVAL_COLUMN_NAME, SRS_EASE_COLUMN_NAME,
+                    SRS_REPETITIONS_COLUMN_NAME, SRS_DUE_COLUMN_NAME, SOURCE_COLUMN_NAME, CREATED_TIME_COLUMN_NAME,
+                    LAST_EDITED_TIME_COLUMN_NAME)
+from decks import get_deck_configs, get_decks_signature, load_decks, get_deck_pages, extract_deck_row
+import pandas as pd
+from Gemini import generate_gemini_response_hedged, DEFAULT_MODEL
+from model_router import ModelRouter, DEFAULT_PREFERENCE
+from prompt_parser import parse_qa_pairs, parse_qa_json
+from prompt_builder import (build_prompt, estimate_tokens, DEFAULT_TOKEN_BUDGET, DEFAULT_MAX_MEANING_CHARS,
+                            QUIZ_RESPONSE_SCHEMA)
+from local_quiz import generate_local_quiz, generate_multiple_choice_quiz, mix_quizzes
+from distractors import DistractorEngine
+from answer_matcher import AnswerMatcher, EXACT, NEAR_MISS, KNOWN_WORD, WRONG
+from workers import BackgroundTask, UiChannel
+from snapshot import save_snapshot, load_snapshot, DEFAULT_SNAPSHOT_PATH
+from scheduler import ReviewScheduler, stored_review_state
+from analytics import AnswerLog, selection_weights, DEFAULT_ANALYTICS_DIR
 import os
 import sys
+import time
 from notion_client import Client
 import threading
-from queue import Queue, Empty
+from queue import Queue
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -19,6 +34,9 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+# SM-2 answer quality for each kind of answer match
+REVIEW_QUALITY = {EXACT: 5, NEAR_MISS: 4, WRONG: 1}
+
 class EnglishStudyApp:
     def __init__(self, root):
         self.root = root
@@ -27,9 +45,13 @@ class EnglishStudyApp:
         
         # Initialize threading-related variables
         self.update_thread = None
-        self.update_queue = Queue()  # Queue for communication between main thread and update thread
+        self.update_queue = UiChannel(root, self.handle_update_result)  # Wakes the Tk thread with results from workers
         self.update_candidates = Queue()  # Queue for storing candidates for updates
+        self.edit_times = {}  # page_id -> last_edited_time after our own writes (update thread only)
         self.is_updating = False
+        self.current_task = None  # Background load or quiz generation in progress
+        self.sync_task = None  # Background sync that does not block the UI
+        self.closing = False
         
         # Configure grid weights to center content
         self.root.grid_rowconfigure(0, weight=1)
@@ -40,6 +62,13 @@ class EnglishStudyApp:
             config_path = resource_path('config.json')
             with open(config_path, 'r') as file:
                 self.config = json.load(file)
+            self.decks = get_deck_configs(self.config)
+            self.decks_by_name = {deck['NAME']: deck for deck in self.decks}
+            # Chooses a Gemini model per quiz and keeps per-model latency, error and quality stats
+            self.router = ModelRouter(
+                self.config.get('GEMINI_MODELS') or [DEFAULT_MODEL],
+                self.config.get('GEMINI_MODEL_PREFERENCE', DEFAULT_PREFERENCE)
+            )
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load config.json: {str(e)}")
             self.root.destroy()
@@ -51,6 +80,18 @@ class EnglishStudyApp:
         self.qa_pairs = []
         self.total_questions = 0
         self.df = None  # Store the database DataFrame
+        self.last_quiz_stats = {}  # Token usage of the last Gemini quiz
+        self.distractors = DistractorEngine()  # Similarity index for multiple-choice distractors
+        self.matcher = AnswerMatcher([])  # Vocabulary index for fuzzy answer matching
+        self.scheduler = ReviewScheduler()  # Due queue for spaced repetition
+        self.quiz_uses_scheduler = False  # Whether the current quiz records spaced-repetition reviews
+        self.quiz_type = None  # Quiz type of the current quiz
+        self.question_shown_at = None  # perf_counter() time the current question was shown
+        try:
+            self.answer_log = AnswerLog(self.config.get('ANALYTICS_DIR', DEFAULT_ANALYTICS_DIR))  # History of answers
+        except Exception as e:
+            print(f"Answer history is disabled: {str(e)}")
+            self.answer_log = None
         
         # Create frames for different pages
         self.start_frame = ttk.Frame(root, padding="20")
@@ -63,12 +104,16 @@ class EnglishStudyApp:
         # Create widgets for both pages
         self.create_start_page()
         self.create_quiz_page()
+        self.create_status_bar()
         
         # Show start page initially
         self.show_start_page()
         
-        # Start checking for update results
-        self.check_update_results()
+        # Start from the local snapshot if there is one
+        self.restore_snapshot()
+        
+        # Flush pending updates before the window closes
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Start the update processing thread
         self.start_update_thread()
@@ -109,12 +154,34 @@ class EnglishStudyApp:
         self.quiz_type_combo = ttk.Combobox(
             quiz_type_frame,
             textvariable=self.quiz_type_var,
-            values=["Gemini Quiz", "Meaning Quiz"],
+            values=["Gemini Quiz", "Local Quiz", "Multiple Choice Quiz", "Meaning Quiz"],
             state="readonly",
             width=15
         )
         self.quiz_type_combo.pack(side=tk.LEFT, padx=5)
         
+        # Word selection mode frame
+        selection_frame = ttk.Frame(settings_frame)
+        selection_frame.pack(pady=5)
+        
+        # Word selection mode label
+        ttk.Label(
+            selection_frame,
+            text="Word Selection:",
+            font=("Arial", 12)
+        ).pack(side=tk.LEFT, padx=5)
+        
+        # Word selection mode combobox
+        self.selection_mode_var = tk.StringVar(value="Weighted Random")
+        self.selection_mode_combo = ttk.Combobox(
+            selection_frame,
+            textvariable=self.selection_mode_var,
+            values=["Weighted Random", "Spaced Repetition"],
+            state="readonly",
+            width=18
+        )
+        self.selection_mode_combo.pack(side=tk.LEFT, padx=5)
+        
         # Word count selector frame for full database
         full_count_frame = ttk.Frame(settings_frame)
         full_count_frame.pack(pady=5)
@@ -198,9 +265,10 @@ class EnglishStudyApp:
         self.quiz_frame.grid_rowconfigure(1, weight=0)  # Question label
         self.quiz_frame.grid_rowconfigure(2, weight=0)  # Answer entry
         self.quiz_frame.grid_rowconfigure(3, weight=0)  # Submit button
-        self.quiz_frame.grid_rowconfigure(4, weight=0)  # Score label
-        self.quiz_frame.grid_rowconfigure(5, weight=0)  # Button frame
-        self.quiz_frame.grid_rowconfigure(6, weight=1)  # Bottom space
+        self.quiz_frame.grid_rowconfigure(4, weight=0)  # Feedback label
+        self.quiz_frame.grid_rowconfigure(5, weight=0)  # Score label
+        self.quiz_frame.grid_rowconfigure(6, weight=0)  # Button frame
+        self.quiz_frame.grid_rowconfigure(7, weight=1)  # Bottom space
         
         # Question display
         self.question_label = ttk.Label(
@@ -231,6 +299,16 @@ class EnglishStudyApp:
         )
         self.submit_button.grid(row=3, column=0, columnspan=2, pady=10)
         
+        # Inline answer feedback
+        self.feedback_label = ttk.Label(
+            self.quiz_frame,
+            text="",
+            wraplength=600,
+            font=("Arial", 11),
+            justify=tk.CENTER
+        )
+        self.feedback_label.grid(row=4, column=0, columnspan=2, pady=5)
+        
         # Score display
         self.score_label = ttk.Label(
             self.quiz_frame,
@@ -238,11 +316,11 @@ class EnglishStudyApp:
             font=("Arial", 10),
             justify=tk.CENTER
         )
-        self.score_label.grid(row=4, column=0, columnspan=2, pady=10)
+        self.score_label.grid(row=5, column=0, columnspan=2, pady=10)
         
         # Button frame
         button_frame = ttk.Frame(self.quiz_frame)
-        button_frame.grid(row=5, column=0, columnspan=2, pady=10)
+        button_frame.grid(row=6, column=0, columnspan=2, pady=10)
         
         # Configure button frame
         button_frame.grid_columnconfigure(0, weight=1)
@@ -283,6 +361,116 @@ class EnglishStudyApp:
         # Bind Enter key to submit
         self.answer_entry.bind('<Return>', lambda e: self.check_answer())
     
+    def create_status_bar(self):
+        # Status bar shared by both pages
+        self.status_frame = ttk.Frame(self.root, padding="5")
+        self.status_frame.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.status_frame.grid_columnconfigure(0, weight=1)
+        
+        # Status message
+        self.status_label = ttk.Label(
+            self.status_frame,
+            text="",
+            font=("Arial", 10)
+        )
+        self.status_label.grid(row=0, column=0, sticky=tk.W)
+        
+        # Progress indicator for background tasks
+        self.progress_bar = ttk.Progressbar(
+            self.status_frame,
+            mode='indeterminate',
+            length=150
+        )
+        self.progress_bar.grid(row=0, column=1, padx=5)
+        
+        # Cancel button for background tasks
+        self.cancel_button = ttk.Button(
+            self.status_frame,
+            text="Cancel",
+            command=self.cancel_current_task,
+            width=10
+        )
+        self.cancel_button.grid(row=0, column=2, padx=5)
+        
+        # Only shown while a task is running
+        self.progress_bar.grid_remove()
+        self.cancel_button.grid_remove()
+    
+    def set_status(self, message, color='black'):
+        self.status_label.config(text=message, foreground=color)
+    
+    def show_feedback(self, message, color='black'):
+        self.feedback_label.config(text=message, foreground=color)
+    
+    def set_busy(self, busy):
+        """Show progress and disable actions that would start another task"""
+        state = 'disabled' if busy else 'normal'
+        for button in (self.start_button, self.new_quiz_button, self.reload_button):
+            button.config(state=state)
+        if busy:
+            self.progress_bar.grid()
+            self.cancel_button.grid()
+            self.progress_bar.start(10)
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.grid_remove()
+            self.cancel_button.grid_remove()
+    
+    def run_task(self, name, work, on_done, busy_message, on_error=None, foreground=True, on_partial=None):
+        """
+        Run work(task) on a background thread. on_done/on_error are called on the
+        Tk thread once the result comes back through the update_queue channel.
+        Foreground tasks disable the actions that start other tasks until they
+        finish; a single non-foreground task (a sync) can run alongside them.
+        
+        Returns:
+            bool: True if the task was started, False if another task is running
+        """
+        if (self.current_task if foreground else self.sync_task) is not None:
+            self.set_status("Please wait for the current task to finish or cancel it.", 'red')
+            return False
+        
+        if on_error is None:
+            on_error = lambda error: self.set_status(f"{name} failed: {error}", 'red')
+        
+        task = BackgroundTask(
+            name,
+            work,
+            self.update_queue,
+            on_done=on_done,
+            on_error=on_error,
+            on_progress=self.set_status,
+            on_partial=on_partial
+        )
+        if foreground:
+            self.current_task = task
+            self.set_busy(True)
+        else:
+            self.sync_task = task
+        self.set_status(busy_message)
+        task.start()
+        return True
+    
+    def cancel_current_task(self):
+        """Cancel the running task and release the UI right away"""
+        if self.current_task is None:
+            return
+        self.current_task.cancel()
+        self.set_status(f"{self.current_task.name} cancelled.")
+        self.current_task = None
+        self.set_busy(False)
+    
+    def handle_task_result(self, result):
+        """Handle a message from a background task (runs on the Tk thread)"""
+        task = result['task']
+        finished = result['type'] not in ('progress', 'partial')
+        if finished and task is self.current_task:
+            self.current_task = None
+            self.set_busy(False)
+        elif finished and task is self.sync_task:
+            self.sync_task = None
+        task.deliver(result)
+    
     def show_start_page(self):
         # Check if database update is in progress
         if self.is_updating:
@@ -294,7 +482,8 @@ class EnglishStudyApp:
             
         self.quiz_frame.grid_remove()
         self.start_frame.grid()
-        self.start_button.config(state='normal')
+        if self.current_task is None:
+            self.start_button.config(state='normal')
     
     def show_quiz_page(self):
         self.start_frame.grid_remove()
@@ -302,43 +491,114 @@ class EnglishStudyApp:
     
     def start_quiz_sequence(self):
         """Start the quiz sequence by loading database first"""
-        self.start_button.config(state='disabled')
-        self.root.update()
-        
         # Only load database if it hasn't been loaded yet
         if self.df is None:
-            if self.load_database():
-                self.show_quiz_page()
-                self.start_new_quiz()
-            else:
-                self.start_button.config(state='normal')
+            self.load_database(on_loaded=self.open_quiz_page)
         else:
             # If database is already loaded, just show quiz page and start quiz
-            self.show_quiz_page()
-            self.start_new_quiz()
+            self.open_quiz_page()
+    
+    def open_quiz_page(self):
+        self.show_quiz_page()
+        self.start_new_quiz()
     
-    def load_database(self):
-        """Load or reload the database from Notion"""
+    def restore_snapshot(self):
+        """Load the vocabulary snapshot for an instant start, then sync with Notion in the background"""
         try:
-            # Get data from Notion database
-            database = get_notion_database(
-                self.config.get('NOTION_API_KEY'),
-                self.config.get('NOTION_DATABASE_ID')
-            )
+            df = load_snapshot(self.snapshot_path(), get_decks_signature(self.decks))
+        except Exception as e:
+            print(f"Ignoring unreadable snapshot: {str(e)}")
+            return
+        if df is None or df.empty:
+            return
+        
+        self.df = df
+        self.load_database(fallback_df=df)
+    
+    def snapshot_path(self):
+        return self.config.get('SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH)
+    
+    def load_database(self, on_loaded=None, fallback_df=None):
+        """
+        Load or reload the database from Notion on a background thread.
+        With fallback_df (the vocabulary restored from the snapshot) the load runs
+        as a non-blocking sync and keeps using fallback_df if Notion is unreachable.
+        """
+        def work(task):
+            indexes = None
+            if fallback_df is not None:
+                # Index the snapshot vocabulary first so that every quiz type works while syncing
+                self.distractors.update(fallback_df)
+                indexes = AnswerMatcher(fallback_df['Word'], fallback_df['Meaning']), ReviewScheduler.from_dataframe(fallback_df)
+                task.report_partial(indexes)
+                task.check_cancelled()
             
-            # Create DataFrame with required columns
-            column_names = ['Word', 'Meaning', 'Multiplicity']
-            self.df = create_word_dataframe(database, column_names)
+            # Get data from all Notion databases concurrently
+            synced = True
+            try:
+                df = load_decks(
+                    self.config.get('NOTION_API_KEY'),
+                    self.decks,
+                    progress_callback=lambda n: task.report_progress(f"Loading database... {n} words fetched"),
+                    cancel_event=task.cancel_event
+                )
+            except Exception as e:
+                if fallback_df is None:
+                    raise
+                print(f"Sync failed, using the local snapshot: {str(e)}")
+                df = fallback_df
+                synced = False
+            task.check_cancelled()
             
-            if self.df is None or self.df.empty:
-                messagebox.showerror("Error", "Database is empty!")
-                return False
-                
-            messagebox.showinfo("Success", "Database loaded successfully!")
-            return True
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load database: {str(e)}")
+            if df is None or df.empty:
+                raise ValueError("Database is empty!")
+            
+            if synced:
+                # Keep the snapshot up to date for the next start
+                try:
+                    save_snapshot(df, self.snapshot_path(), get_decks_signature(self.decks))
+                except Exception as e:
+                    print(f"Failed to write snapshot: {str(e)}")
+            
+            if not synced:
+                # The snapshot vocabulary is already indexed
+                return (df, *indexes, synced)
+            
+            task.report_progress("Building vocabulary indexes...")
+            
+            # Sync the distractor matrix with the loaded vocabulary
+            self.distractors.update(df)
+            
+            # Rebuild the answer matching index and the review queue over the loaded vocabulary
+            return df, AnswerMatcher(df['Word'], df['Meaning']), ReviewScheduler.from_dataframe(df), synced
+        
+        def partial(indexes):
+            # Use the snapshot's indexes unless a newer vocabulary has been installed meanwhile
+            if self.df is fallback_df:
+                self.matcher, self.scheduler = indexes
+        
+        def done(result):
+            self.df, self.matcher, self.scheduler, synced = result
+            if synced:
+                self.set_status(f"Database loaded successfully! ({len(self.df)} words)", 'green')
+            else:
+                self.set_status(f"Offline: using {len(self.df)} words from the local snapshot", 'orange')
+            if on_loaded is not None:
+                on_loaded()
+        
+        if fallback_df is None and self.sync_task is not None:
+            self.set_status("Please wait for the database sync to finish.", 'red')
             return False
+        if fallback_df is not None:
+            return self.run_task(
+                "Database sync",
+                work,
+                done,
+                f"Loaded {len(fallback_df)} words from snapshot. Syncing with Notion...",
+                foreground=False,
+                on_partial=partial
+            )
+        return self.run_task("Database load", work, done, "Loading database...")
     
     def start_new_quiz(self):
         """Start a new quiz with the current settings"""
@@ -349,60 +609,188 @@ class EnglishStudyApp:
             days = int(self.days_var.get()) if n_from_recent > 0 else None
             
             if n_from_full == 0 and n_from_recent == 0:
-                messagebox.showwarning("Warning", "Please select at least one word from either full database or recent words!")
+                self.set_status("Please select at least one word from either full database or recent words!", 'red')
                 return
             
-            # Get random pages with optional days filter
-            selected_pages = get_random_pages(self.df, n_from_full, n_from_recent, days)
+            if self.selection_mode_var.get() == "Spaced Repetition":
+                # Take the most overdue words from the review queue
+                page_ids = self.scheduler.next_due(n_from_full + n_from_recent)
+                rows = [self.scheduler.row_of[page_id] for page_id in page_ids]
+                selected_pages = self.df.iloc[rows][['page_id', 'Word', 'Meaning', 'Multiplicity', SOURCE_COLUMN_NAME]]
+                self.quiz_uses_scheduler = True
+            else:
+                # Get random pages with optional days filter, following the per-deck quotas
+                selected_pages = get_deck_pages(
+                    self.df, self.decks, n_from_full, n_from_recent, days,
+                    weights=self.get_selection_weights()
+                )
+                self.quiz_uses_scheduler = False
             
             if selected_pages.empty:
-                messagebox.showwarning("Warning", "No words found matching the selected criteria!")
+                self.set_status("No words found matching the selected criteria!", 'red')
                 return
             
-            # Generate questions based on quiz type
+            # Generate questions on a background thread
             quiz_type = self.quiz_type_var.get()
-            if quiz_type == "Gemini Quiz":
-                # Generate prompt and get response from Gemini
-                prompt = get_prompt(selected_pages)
-                response = generate_gemini_response(prompt, self.config.get('GEMINI_API_KEY'))
-                
-                # Parse QA pairs
-                self.qa_pairs = parse_qa_pairs(response)
-                
-                if not self.qa_pairs:
-                    messagebox.showerror("Error", "Failed to generate questions!")
-                    return
-            else:  # Meaning Quiz
-                # Create questions directly from word meanings
-                self.qa_pairs = []
-                for _, row in selected_pages.iterrows():
-                    question = f"What is the word that means '{row['Meaning']}'?"
-                    answer = row['Word']
-                    self.qa_pairs.append((question, answer))
-            
-            # Reset quiz state
-            self.current_question = 0
-            self.score = 0
-            self.total_questions = len(self.qa_pairs)
-            
-            # Enable quiz interface
-            self.answer_entry.config(state='normal')
-            self.submit_button.config(state='normal')
-            self.answer_var.set("")
-            
-            # Update question display
-            self.update_question()
-            self.update_score()
+            self.run_task(
+                "Quiz generation",
+                lambda task: self.generate_quiz(quiz_type, selected_pages),
+                lambda qa_pairs: self.install_quiz(qa_pairs, quiz_type),
+                f"Generating {quiz_type}..."
+            )
             
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to start new quiz: {str(e)}")
+            self.set_status(f"Failed to start new quiz: {str(e)}", 'red')
+    
+    def generate_quiz(self, quiz_type, selected_pages):
+        """Generate QA pairs for the selected pages (runs on a background thread)"""
+        # Generate questions based on quiz type
+        if quiz_type == "Gemini Quiz":
+            try:
+                qa_pairs = self.generate_gemini_quiz(selected_pages)
+            except TimeoutError as e:
+                print(f"{str(e)}, using local questions instead")
+                qa_pairs = []
+            except Exception as e:
+                print(f"Gemini quiz failed, using local questions instead: {str(e)}")
+                qa_pairs = []
+            
+            if not qa_pairs:
+                # Fall back to the local question engine
+                qa_pairs = generate_local_quiz(selected_pages)
+            elif float(self.config.get('LOCAL_MIX_RATIO', 0)) > 0:
+                # Mix local questions into the Gemini quiz
+                qa_pairs = mix_quizzes(
+                    qa_pairs,
+                    generate_local_quiz(selected_pages),
+                    float(self.config.get('LOCAL_MIX_RATIO'))
+                )
+        elif quiz_type == "Multiple Choice Quiz":
+            # Pick confusable distractors for all selected words in one batch
+            distractors = self.distractors.pick(
+                selected_pages['page_id'].tolist(),
+                k=int(self.config.get('MULTIPLE_CHOICE_DISTRACTORS', 3))
+            )
+            qa_pairs = generate_multiple_choice_quiz(selected_pages, distractors)
+        elif quiz_type == "Local Quiz":
+            # Generate varied questions locally without the network
+            qa_pairs = generate_local_quiz(selected_pages)
+        else:  # Meaning Quiz
+            # Create questions directly from word meanings
+            qa_pairs = []
+            for _, row in selected_pages.iterrows():
+                question = f"What is the word that means '{row['Meaning']}'?"
+                answer = row['Word']
+                qa_pairs.append((question, answer, row['page_id']))
+        
+        if not qa_pairs:
+            raise ValueError("Failed to generate questions!")
+        return qa_pairs
+    
+    def install_quiz(self, qa_pairs, quiz_type):
+        """Show a freshly generated quiz (runs on the Tk thread)"""
+        # Reset quiz state
+        self.qa_pairs = qa_pairs
+        self.quiz_type = quiz_type
+        self.current_question = 0
+        self.score = 0
+        self.total_questions = len(self.qa_pairs)
+        
+        # Enable quiz interface
+        self.answer_entry.config(state='normal')
+        self.submit_button.config(state='normal')
+        self.answer_var.set("")
+        self.show_feedback("")
+        self.set_status("")
+        
+        # Update question display
+        self.update_question()
+        self.update_score()
+    
+    def generate_gemini_quiz(self, selected_pages):
+        """Generate QA pairs for the selected pages with Gemini"""
+        # In JSON mode Gemini answers with schema-constrained items that refer to prompt entries by id
+        structured = self.config.get('GEMINI_OUTPUT_MODE', 'json') == 'json'
+        
+        # Generate prompt within the token budget and get response from Gemini
+        prompt, prompt_stats = build_prompt(
+            selected_pages,
+            token_budget=int(self.config.get('PROMPT_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET)),
+            max_meaning_chars=int(self.config.get('PROMPT_MAX_MEANING_CHARS', DEFAULT_MAX_MEANING_CHARS)),
+            structured=structured
+        )
+        
+        # Route the quiz to a model by its size, recent latencies, error rate and output quality
+        model = self.router.choose(prompt_stats['words_packed'])
+        model_stats = self.router.stats[model]
+        started = time.perf_counter()
+        try:
+            response, usage = generate_gemini_response_hedged(
+                prompt,
+                self.config.get('GEMINI_API_KEY'),
+                deadline=float(self.config.get('GEMINI_DEADLINE_SECONDS', 20)),
+                tracker=model_stats.latency,
+                response_schema=QUIZ_RESPONSE_SCHEMA if structured else None,
+                model=model
+            )
+        except Exception:
+            model_stats.record_error()
+            raise
+        elapsed = time.perf_counter() - started
+        self.report_token_usage(prompt_stats, usage, response)
+        
+        # Parse QA pairs; output that cannot be parsed counts as zero quality
+        packed = prompt_stats['packed']
+        try:
+            if structured:
+                qa_pairs = parse_qa_json(response, packed['Word'].str.strip().tolist(), packed['page_id'].tolist())
+            else:
+                qa_pairs = [(question, answer, None) for question, answer in parse_qa_pairs(response)]
+        except Exception:
+            model_stats.record_success(elapsed, prompt_stats['words_packed'], 0.0)
+            raise
+        model_stats.record_success(elapsed, prompt_stats['words_packed'], self.quiz_coverage(qa_pairs, packed))
+        self.report_latency(model)
+        return qa_pairs
+    
+    def quiz_coverage(self, qa_pairs, packed):
+        """Fraction of the prompt's words that got at least one question"""
+        words = set(packed['Word'].str.strip().str.lower())
+        if not words:
+            return 1.0
+        answered = {answer.strip().lower() for _, answer, _ in qa_pairs}
+        return len(words & answered) / len(words)
+    
+    def report_token_usage(self, prompt_stats, usage, response):
+        """Record and print the tokens in and out of a Gemini quiz"""
+        self.last_quiz_stats = {
+            'tokens_in': usage.get('tokens_in') or prompt_stats['tokens_in'],
+            'tokens_out': usage.get('tokens_out') or estimate_tokens(response),
+            'words_packed': prompt_stats['words_packed'],
+            'words_dropped': prompt_stats['words_dropped'],
+        }
+        print(
+            f"Gemini quiz tokens: in={self.last_quiz_stats['tokens_in']} "
+            f"(estimated {prompt_stats['tokens_in']}), out={self.last_quiz_stats['tokens_out']}, "
+            f"words packed={prompt_stats['words_packed']}, dropped={prompt_stats['words_dropped']}"
+        )
+    
+    def report_latency(self, model):
+        """Print the rolling latency percentiles, error rate and output quality of a Gemini model"""
+        stats = self.router.summary(model)
+        print(
+            f"{model} latency over {stats['count']} calls: "
+            f"p50={stats['p50']:.2f}s p95={stats['p95']:.2f}s p99={stats['p99']:.2f}s, "
+            f"error rate={stats['error_rate']:.0%}, quality={stats['quality']:.0%}"
+        )
     
     def update_question(self):
         if self.current_question < self.total_questions:
-            question, _ = self.qa_pairs[self.current_question]
+            question, _, _ = self.qa_pairs[self.current_question]
             self.question_label.config(
                 text=f"Question {self.current_question + 1}/{self.total_questions}:\n{question}"
             )
+            self.question_shown_at = time.perf_counter()
             # Ensure answer entry is enabled and focused
             self.answer_entry.config(state='normal')
             self.answer_entry.focus_set()
@@ -416,41 +804,41 @@ class EnglishStudyApp:
             return
         
         user_answer = self.answer_var.get().strip().lower()
-        _, correct_answer = self.qa_pairs[self.current_question]
+        _, correct_answer, page_id = self.qa_pairs[self.current_question]
+        # Every multiple-choice option is a vocabulary word, so picking another one is always a mistake
+        match = self.matcher.classify(
+            user_answer, correct_answer, allow_known_word=self.quiz_type != "Multiple Choice Quiz"
+        )
+        row = self.find_word_row(correct_answer, page_id)
+        self.record_answer(row, match.kind in (EXACT, NEAR_MISS))
         
-        if user_answer == correct_answer.lower():
+        if self.quiz_uses_scheduler and match.kind != KNOWN_WORD and row is not None:
+            # Reschedule the word; near-misses are correct answers with some hesitation
+            self.record_review(row, REVIEW_QUALITY[match.kind])
+        
+        if match.kind == NEAR_MISS:
+            # Typos and inflections count as correct but do not change Multiplicity
+            self.score += 1
+            self.show_feedback(f"✓ Almost! The exact answer is: {correct_answer}", 'green')
+        elif match.kind == KNOWN_WORD:
+            # Another word from the vocabulary with the same meaning is not treated as a real mistake
+            self.show_feedback(
+                f"'{match.matched_word}' from your list means the same. The expected answer is: {correct_answer}",
+                'orange'
+            )
+        elif match.kind == EXACT:
             self.score += 1
-            messagebox.showinfo("Correct!", "✓ Well done!")
+            self.show_feedback("✓ Well done!", 'green')
             # Add correct answer to update candidates queue
             try:
-                current_word_data = self.df[self.df['Word'] == correct_answer].iloc[0]
-                if current_word_data['Multiplicity'] > 1:  # Only decrease if not already at 0
-                    self.update_candidates.put({
-                        'page_id': current_word_data['page_id'],
-                        'current_multiplicity': current_word_data['Multiplicity'] - 2,
-                        'decrease': True,  # Flag to indicate this is a decrease operation
-                        'word': correct_answer
-                    })
-                    # Update local DataFrame
-                    self.df.loc[self.df['Word'] == correct_answer, 'Multiplicity'] -= 1
+                self.queue_multiplicity_change(row, -1)
             except Exception as e:
                 print(f"Error storing correct answer: {str(e)}")
         else:
-            messagebox.showerror(
-                "Incorrect",
-                f"✗ The correct answer is: {correct_answer}"
-            )
+            self.show_feedback(f"✗ The correct answer is: {correct_answer}", 'red')
             # Add incorrect answer to update candidates queue
             try:
-                current_word_data = self.df[self.df['Word'] == correct_answer].iloc[0]
-                self.update_candidates.put({
-                    'page_id': current_word_data['page_id'],
-                    'current_multiplicity': current_word_data['Multiplicity'],
-                    'decrease': False,  # Flag to indicate this is an increase operation
-                    'word': correct_answer
-                })
-                # Update local DataFrame
-                self.df.loc[self.df['Word'] == correct_answer, 'Multiplicity'] += 1
+                self.queue_multiplicity_change(row, 1)
             except Exception as e:
                 print(f"Error storing incorrect answer: {str(e)}")
         
@@ -459,11 +847,89 @@ class EnglishStudyApp:
         
         # Reset answer entry and update question
         self.answer_var.set("")
-        self.answer_entry.config(state='disabled')
-        self.submit_button.config(state='disabled')
-        self.root.update()
         self.update_question()
     
+    def find_word_row(self, word, page_id=None):
+        """
+        Find the DataFrame row (index label) of a quiz answer.
+        Quiz items that carry a page ID are mapped straight to their row through the
+        review queue's page_id -> row index; other items are matched by word.
+        """
+        if page_id is not None:
+            position = self.scheduler.row_of.get(page_id)
+            if position is not None and position < len(self.df) and self.df['page_id'].iat[position] == page_id:
+                return self.df.index[position]
+            matches = self.df.index[self.df['page_id'] == page_id]
+        else:
+            matches = self.df.index[self.df['Word'] == word]
+        return matches[0] if len(matches) else None
+    
+    def queue_multiplicity_change(self, row, delta):
+        """
+        Queue a change of a word's Multiplicity by delta and apply it to the local row right away.
+        The update thread applies the delta to the current value in Notion and sends back the result.
+        """
+        current_word_data = self.df.loc[row]
+        self.update_candidates.put({
+            'page_id': current_word_data['page_id'],
+            'delta': delta,
+            'last_edited_time': current_word_data.get(LAST_EDITED_TIME_COLUMN_NAME),
+            'word': current_word_data['Word'],
+            'source': current_word_data[SOURCE_COLUMN_NAME]
+        })
+        # Update local DataFrame (Multiplicity is stored +1, so it never goes below 1)
+        self.df.loc[row, 'Multiplicity'] = max(1, current_word_data['Multiplicity'] + delta)
+    
+    def record_answer(self, row, correct):
+        """Append an answer to the analytics log; compaction of the log runs on the update thread"""
+        if self.answer_log is None or row is None:
+            return
+        try:
+            if self.answer_log.append(
+                self.df.loc[row, 'page_id'],
+                correct,
+                time.perf_counter() - self.question_shown_at,
+                self.quiz_type
+            ):
+                self.update_candidates.put({'type': 'compact_answers'})
+        except Exception as e:
+            print(f"Error logging answer: {str(e)}")
+    
+    def get_selection_weights(self):
+        """Extra word selection weights from the answer history, or None if not configured"""
+        accuracy_weight = float(self.config.get('ANALYTICS_ACCURACY_WEIGHT', 0))
+        speed_weight = float(self.config.get('ANALYTICS_SPEED_WEIGHT', 0))
+        if self.answer_log is None or (accuracy_weight <= 0 and speed_weight <= 0):
+            return None
+        try:
+            return selection_weights(self.answer_log.word_stats(), accuracy_weight, speed_weight)
+        except Exception as e:
+            print(f"Ignoring answer history weights: {str(e)}")
+            return None
+    
+    def record_review(self, row, quality):
+        """Reschedule a word in the review queue and store its new state in Notion"""
+        try:
+            current_word_data = self.df.loc[row]
+            state = self.scheduler.review(current_word_data['page_id'], quality)
+            if state is None:
+                return
+            
+            # Update local DataFrame
+            self.df.loc[row, SRS_INTERVAL_COLUMN_NAME] = state.interval
+            self.df.loc[row, SRS_EASE_COLUMN_NAME] = state.ease
+            self.df.loc[row, SRS_REPETITIONS_COLUMN_NAME] = state.repetitions
+            self.df.loc[row, SRS_DUE_COLUMN_NAME] = state.due
+            
+            self.update_candidates.put({
+                'type': 'schedule',
+                'page_id': current_word_data['page_id'],
+                'state': state,
+                'word': current_word_data['Word']
+            })
+        except Exception as e:
+            print(f"Error storing review: {str(e)}")
+    
     def update_score(self):
         self.score_label.config(
             text=f"Score: {self.score}/{self.current_question}"
@@ -477,62 +943,150 @@ class EnglishStudyApp:
     def process_updates(self):
         """Process updates from the update_candidates queue"""
         while True:
-            try:
-                # Get an update candidate from the queue
-                answer = self.update_candidates.get(timeout=1)  # Wait 1 second before checking again
-                
+            # Block until there is an update candidate; None asks the thread to stop
+            answer = self.update_candidates.get()
+            if answer is None:
+                self.update_candidates.task_done()
+                return
+            
+            if answer.get('type') == 'compact_answers':
                 try:
-                    notion = Client(auth=self.config.get('NOTION_API_KEY'))
-                    if update_word_multiplicity(notion, answer['page_id'], answer['current_multiplicity'], answer.get('decrease', False)):
-                        self.update_queue.put({
-                            'type': 'success',
-                            'word': answer.get('word', 'Unknown word')
-                        })
-                    else:
-                        self.update_queue.put({
-                            'type': 'failed',
-                            'word': answer.get('word', 'Unknown word')
-                        })
+                    self.answer_log.compact()
                 except Exception as e:
+                    print(f"Error compacting answer history: {str(e)}")
+                self.update_candidates.task_done()
+                continue
+            
+            try:
+                notion = Client(auth=self.config.get('NOTION_API_KEY'))
+                result = {'type': 'success', 'word': answer.get('word', 'Unknown word'), 'page_id': answer['page_id']}
+                if answer.get('type') == 'schedule':
+                    state = answer['state']
+                    page = update_word_schedule(
+                        notion, answer['page_id'], state.interval, state.ease, state.repetitions, state.due
+                    )
+                    updated = page is not None
+                else:
+                    # Apply the change to the Multiplicity property of the word's own database
+                    deck = self.decks_by_name.get(answer.get('source'), self.decks[0])
+                    change = apply_multiplicity_delta(
+                        notion, answer['page_id'], answer['delta'],
+                        known_edited_time=self.edit_times.get(answer['page_id'], answer.get('last_edited_time')),
+                        property_name=deck['MULTIPLICITY_COLUMN_NAME']
+                    )
+                    updated = change is not None
+                    if updated:
+                        page = change['page']
+                        result['multiplicity'] = change['multiplicity']
+                        if change['conflict']:
+                            # Edited on another device: merge the whole page into the local row
+                            result['row'] = extract_deck_row(page, deck)
+                if updated:
+                    # Remember our own edit so that it is not mistaken for one from another device
+                    self.edit_times[answer['page_id']] = page.get('last_edited_time')
+                    result['last_edited_time'] = page.get('last_edited_time')
+                    self.update_queue.put(result)
+                else:
                     self.update_queue.put({
-                        'type': 'error',
-                        'error': str(e),
+                        'type': 'failed',
                         'word': answer.get('word', 'Unknown word')
                     })
-                
-                # Mark the task as done
-                self.update_candidates.task_done()
-                
-            except Empty:  # Use Empty instead of Queue.Empty
-                # Queue is empty, continue waiting
-                continue
+            except Exception as e:
+                self.update_queue.put({
+                    'type': 'error',
+                    'error': str(e),
+                    'word': answer.get('word', 'Unknown word')
+                })
+            
+            # Mark the task as done
+            self.update_candidates.task_done()
 
-    def check_update_results(self):
-        """Check for results from the update thread and handle them"""
-        try:
-            while True:
-                result = self.update_queue.get_nowait()
-                if result.get('type') == 'success':
-                    print(f"Successfully updated: {result.get('word')}")
-                elif result.get('type') == 'failed':
-                    print(f"Failed to update: {result.get('word')}")
-                elif result.get('type') == 'error':
-                    print(f"Error updating {result.get('word')}: {result.get('error')}")
-        except Empty:  # Use Empty instead of Queue.Empty
-            pass
-        finally:
-            self.root.after(100, self.check_update_results)
+    def handle_update_result(self, result):
+        """Handle a message from the update thread or a background task (runs on the Tk thread)"""
+        if 'task' in result:
+            # Message from a background load or quiz generation
+            self.handle_task_result(result)
+        elif result.get('type') == 'success':
+            self.merge_update(result)
+            print(f"Successfully updated: {result.get('word')}")
+        elif result.get('type') == 'failed':
+            print(f"Failed to update: {result.get('word')}")
+        elif result.get('type') == 'error':
+            print(f"Error updating {result.get('word')}: {result.get('error')}")
+    
+    def merge_update(self, result):
+        """Bring the local row of an updated word in line with Notion, without reloading the database"""
+        if self.df is None:
+            return
+        row = self.find_word_row(result.get('word'), result['page_id'])
+        if row is None:
+            return
+        
+        values = dict(result.get('row') or {})
+        if values:
+            print(f"Merged changes from another device: {result.get('word')}")
+        if 'multiplicity' in result:
+            values['Multiplicity'] = result['multiplicity']
+        values[LAST_EDITED_TIME_COLUMN_NAME] = result.get('last_edited_time')
+        
+        for column, value in values.items():
+            if column in ('page_id', CREATED_TIME_COLUMN_NAME) or column not in self.df.columns:
+                continue
+            if pd.api.types.is_datetime64_any_dtype(self.df[column]):
+                # Columns restored from the snapshot keep times as naive UTC
+                value = pd.to_datetime(value, utc=True, format='ISO8601', errors='coerce')
+                value = pd.NaT if pd.isna(value) else value.tz_convert(None)
+            self.df.at[row, column] = value
+        
+        if result.get('row'):
+            # Keep the review queue in line with the schedule stored by the other device
+            state = stored_review_state(
+                values.get(SRS_INTERVAL_COLUMN_NAME), values.get(SRS_EASE_COLUMN_NAME),
+                values.get(SRS_REPETITIONS_COLUMN_NAME), values.get(SRS_DUE_COLUMN_NAME)
+            )
+            if state is not None:
+                self.scheduler.set_state(result['page_id'], state)
+    
+    def on_close(self):
+        """Stop background work, flush pending Notion updates and close the window"""
+        if self.closing:
+            return
+        self.closing = True
+        for task in (self.current_task, self.sync_task):
+            if task is not None:
+                task.cancel()
+        
+        # Let the update thread finish the queued updates, then stop it
+        self.set_status("Saving pending updates...")
+        self.update_candidates.put(None)
+        deadline = time.perf_counter() + float(self.config.get('SHUTDOWN_FLUSH_SECONDS', 10))
+        while self.update_thread.is_alive() and time.perf_counter() < deadline:
+            self.update_thread.join(timeout=0.05)
+            # Keep handling events so that workers waiting on the Tk thread can finish
+            self.root.update()
+        if self.update_thread.is_alive():
+            print(f"Closing with {self.update_candidates.qsize()} update(s) not saved")
+        
+        self.update_queue.close()
+        if self.answer_log is not None:
+            self.answer_log.close()
+        
+        stats = self.update_queue.latency.summary()
+        if stats['count']:
+            print(
+                f"Result delivery latency over {stats['count']} messages: "
+                f"p50={stats['p50'] * 1000:.1f}ms p95={stats['p95'] * 1000:.1f}ms p99={stats['p99'] * 1000:.1f}ms"
+            )
+        self.root.destroy()
 
     def show_final_score(self):
         percentage = (self.score / self.total_questions) * 100
-        messagebox.showinfo(
-            "Quiz Completed!",
-            f"Final Score: {self.score}/{self.total_questions}\n"
-            f"Percentage: {percentage:.1f}%"
-        )
         
-        # Update UI immediately without waiting for updates
-        self.question_label.config(text="Click 'New Quiz' to start another quiz!")
+        # Show the final score inline instead of a modal dialog
+        self.question_label.config(
+            text=f"Quiz Completed! Final Score: {self.score}/{self.total_questions} "
+                 f"({percentage:.1f}%)\nClick 'New Quiz' to start another quiz!"
+        )
         self.answer_entry.config(state='normal')
         self.submit_button.config(state='normal')
 
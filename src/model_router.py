@@ -0,0 +1,122 @@
+import threading
+import numpy as np
+from collections import deque
+from typing import Dict, List, Optional
+from latency import LatencyTracker
+
+
+PREFERENCES = {'latency': 1.0, 'balanced': 0.5, 'quality': 0.0}  # Weight of speed against model quality
+DEFAULT_PREFERENCE = 'balanced'
+SMALL_QUIZ_WORDS = 10  # Quizzes up to this size go to the fastest qualifying model
+MIN_SAMPLES = 3  # Calls needed before a model's error rate and quality are trusted
+MAX_ERROR_RATE = 0.3
+MIN_QUALITY = 0.8  # Minimum mean fraction of prompt words covered by the parsed questions
+DEFAULT_SECONDS_PER_WORD = 0.5  # Assumed speed of models that were never called
+
+
+class ModelStats:
+    """Rolling statistics of one model: latency, error rate and quality of the parsed output"""
+
+    def __init__(self, window: int = 50):
+        self.latency = LatencyTracker(window)  # Seconds per request, drives request hedging
+        self.seconds_per_word = LatencyTracker(window)  # Seconds per prompt word of successful calls
+        self.errors = deque(maxlen=window)  # 1 for a failed call, 0 for a successful one
+        self.quality = deque(maxlen=window)  # Fraction of prompt words covered by the parsed questions
+        self.lock = threading.Lock()
+
+    @property
+    def calls(self) -> int:
+        return len(self.errors)
+
+    def record_success(self, seconds: float, n_words: int, quality: float):
+        self.seconds_per_word.record(seconds / max(n_words, 1))
+        with self.lock:
+            self.errors.append(0)
+            self.quality.append(quality)
+
+    def record_error(self):
+        with self.lock:
+            self.errors.append(1)
+
+    def error_rate(self) -> float:
+        with self.lock:
+            return float(np.mean(self.errors)) if self.errors else 0.0
+
+    def mean_quality(self) -> Optional[float]:
+        with self.lock:
+            return float(np.mean(self.quality)) if self.quality else None
+
+    def qualifies(self) -> bool:
+        """Whether the model passes the error rate and quality checks (untested models do)"""
+        if self.calls < MIN_SAMPLES:
+            return True
+        quality = self.mean_quality()
+        return self.error_rate() <= MAX_ERROR_RATE and (quality is None or quality >= MIN_QUALITY)
+
+
+class ModelRouter:
+    """
+    Choose a Gemini model for each quiz.
+
+    Models are listed from the highest to the lowest quality. Small quizzes go to
+    the model with the lowest expected latency among those that pass the error
+    rate and output quality checks. Larger quizzes trade the expected latency off
+    against the model's rank according to the preference ('latency', 'balanced'
+    or 'quality'). The expected latency is the median seconds per prompt word of
+    recent calls times the quiz size.
+
+    Models with fewer than MIN_SAMPLES calls are tried on small quizzes first, so
+    that every model gets statistics while the cost of a slow answer stays low.
+    """
+
+    def __init__(self, models: List[str], preference: str = DEFAULT_PREFERENCE):
+        if not models:
+            raise ValueError("At least one Gemini model must be configured")
+        if preference not in PREFERENCES:
+            raise ValueError(f"Unknown model preference '{preference}', use one of {list(PREFERENCES)}")
+        self.models = list(models)
+        self.preference = preference
+        self.stats: Dict[str, ModelStats] = {model: ModelStats() for model in self.models}
+
+    def expected_latency(self, model: str, n_words: int) -> float:
+        seconds_per_word = self.stats[model].seconds_per_word.percentile(50)
+        if seconds_per_word is None:
+            known = [stats.seconds_per_word.percentile(50) for stats in self.stats.values()]
+            known = [value for value in known if value is not None]
+            seconds_per_word = float(np.median(known)) if known else DEFAULT_SECONDS_PER_WORD
+        return seconds_per_word * max(n_words, 1)
+
+    def choose(self, n_words: int) -> str:
+        """
+        Pick the model for a quiz.
+
+        Args:
+            n_words: Number of words in the prompt
+
+        Returns:
+            Model name
+        """
+        candidates = [model for model in self.models if self.stats[model].qualifies()] or self.models
+        latencies = np.array([self.expected_latency(model, n_words) for model in candidates])
+        if len(candidates) == 1:
+            return candidates[0]
+        if n_words <= SMALL_QUIZ_WORDS:
+            untested = [model for model in candidates if self.stats[model].calls < MIN_SAMPLES]
+            if untested:
+                return untested[0]
+            return candidates[int(np.argmin(latencies))]
+
+        speed_weight = PREFERENCES[self.preference]
+        speed = latencies.min() / latencies
+        ranks = np.array([self.models.index(model) for model in candidates])
+        quality = 1 - ranks / max(len(self.models) - 1, 1)
+        scores = speed_weight * speed + (1 - speed_weight) * quality
+        return candidates[int(np.argmax(scores))]
+
+    def summary(self, model: str) -> Dict[str, Optional[float]]:
+        stats = self.stats[model]
+        return {
+            **stats.latency.summary(),
+            'error_rate': stats.error_rate(),
+            'quality': stats.mean_quality(),
+        }
@@ -0,0 +1,146 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Tuple
+from Notion import WORD_COLUMN_NAME, MEANING_COLUMN_NAME
+
+
+DEFAULT_TOKEN_BUDGET = 2000
+DEFAULT_MAX_MEANING_CHARS = 120
+TRUNCATION_MARK = "…"
+
+# Compact form of the instruction block used by get_prompt
+PROMPT_INSTRUCTION = "영어 단어 학습용 문제를 만들어줘. 각 단어마다 최소 한 문제. \
+문제에 \";\" 금지. 출력 형식 외 출력 금지. \
+입력: \"[단어;뜻]\" 출력: \"Q: 문제;A:단어\" 입력 단어들:"
+
+# Instruction for structured (JSON) output; entries carry a numeric id
+JSON_PROMPT_INSTRUCTION = "영어 단어 학습용 문제를 만들어줘. 각 단어마다 최소 한 문제. \
+입력: \"[id;단어;뜻]\" 각 문제는 question, 정답 단어 answer, 해당 단어의 id 로 출력. 입력 단어들:"
+
+# Gemini response schema for structured output
+QUIZ_RESPONSE_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'question': {'type': 'STRING'},
+            'answer': {'type': 'STRING'},
+            'id': {'type': 'INTEGER'},
+        },
+        'required': ['question', 'answer', 'id'],
+    },
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text without calling the tokenizer.
+    ASCII text averages about 4 characters per token, while Hangul and other
+    non-ASCII characters are counted as one token each (a conservative bound).
+
+    Args:
+        text: Text to estimate
+
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    n_ascii = len(text.encode('ascii', 'ignore'))
+    n_other = len(text) - n_ascii
+    return int(np.ceil(n_ascii / 4)) + n_other
+
+
+def estimate_tokens_series(texts: pd.Series) -> np.ndarray:
+    """
+    Vectorized version of estimate_tokens for a Series of strings.
+
+    Args:
+        texts: Series of strings
+
+    Returns:
+        Array of estimated token counts
+    """
+    total = texts.str.len().to_numpy(dtype=np.int64)
+    n_other = texts.str.count(r'[^\x00-\x7f]').to_numpy(dtype=np.int64)
+    return np.ceil((total - n_other) / 4).astype(np.int64) + n_other
+
+
+def normalize_meanings(meanings: pd.Series, max_chars: int = DEFAULT_MAX_MEANING_CHARS) -> pd.Series:
+    """
+    Normalize meanings for use in a prompt: collapse whitespace (multi-block
+    rich_text is joined by spaces and newlines), drop the ";" separator and
+    truncate oversized meanings.
+
+    Args:
+        meanings: Series of meaning strings
+        max_chars: Maximum number of characters kept per meaning
+
+    Returns:
+        Series of normalized meanings
+    """
+    normalized = (
+        meanings.fillna('').astype(str)
+        .str.replace(';', ',', regex=False)
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+    )
+    too_long = normalized.str.len() > max_chars
+    if too_long.any():
+        normalized = normalized.where(
+            ~too_long,
+            normalized.str.slice(0, max_chars).str.rstrip() + TRUNCATION_MARK
+        )
+    return normalized
+
+
+def build_prompt(df: pd.DataFrame, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 max_meaning_chars: int = DEFAULT_MAX_MEANING_CHARS,
+                 structured: bool = False) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build a Gemini prompt that fits in a token budget.
+    Words are deduplicated (case-insensitive), meanings are normalized and
+    entries are packed in order until the estimated budget is reached.
+
+    Args:
+        df: Input DataFrame containing Word and Meaning columns
+        token_budget: Maximum estimated number of prompt tokens
+        max_meaning_chars: Maximum number of characters kept per meaning
+        structured: If True, build the prompt for JSON output (see QUIZ_RESPONSE_SCHEMA),
+            where entry i of the packed rows is given the id i
+
+    Returns:
+        Tuple of (prompt, stats) where stats contains 'tokens_in',
+        'words_packed', 'words_dropped' and 'packed' (the DataFrame of packed rows)
+    """
+    words = df[WORD_COLUMN_NAME].fillna('').astype(str).str.strip()
+    unique_mask = ~words.str.lower().duplicated() & (words != '')
+    unique_df = df[unique_mask.to_numpy()]
+    words = words[unique_mask]
+    meanings = normalize_meanings(unique_df[MEANING_COLUMN_NAME], max_chars=max_meaning_chars)
+
+    if structured:
+        # Format each row as "[id;Word;Meaning]"
+        instruction = JSON_PROMPT_INSTRUCTION
+        ids = pd.Series(np.arange(len(words)).astype(str), index=words.index)
+        entries = '[' + ids + ';' + words + ';' + meanings + ']'
+    else:
+        # Format each row as "[Word;Meaning]"
+        instruction = PROMPT_INSTRUCTION
+        entries = '[' + words + ';' + meanings + ']'
+
+    # Pack entries until the budget is used up (+1 for the joining space)
+    header_tokens = estimate_tokens(instruction)
+    entry_tokens = estimate_tokens_series(entries) + 1
+    n_packed = int(np.searchsorted(np.cumsum(entry_tokens), token_budget - header_tokens, side='right'))
+
+    formatted_words = " ".join(entries.iloc[:n_packed])
+    final_prompt = f"{instruction} {formatted_words}"
+
+    stats = {
+        'tokens_in': header_tokens + int(entry_tokens[:n_packed].sum()),
+        'words_packed': n_packed,
+        'words_dropped': len(df) - n_packed,
+        'packed': unique_df.iloc[:n_packed],
+    }
+    return final_prompt, stats
@@ -1,5 +1,6 @@
 import re
-from typing import List, Tuple
+import json
+from typing import List, Optional, Sequence, Tuple
 import time
 
 def parse_qa_pairs(response: str) -> List[Tuple[str, str]]:
@@ -27,6 +28,32 @@ def parse_qa_pairs(response: str) -> List[Tuple[str, str]]:
     
     return qa_pairs
 
+def parse_qa_json(response: str, words: Sequence[str], page_ids: Sequence[str]) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Parse a structured (JSON) Gemini response into question-answer items.
+    Each item's id refers to an entry of the prompt, so the answer and page ID are
+    taken from the vocabulary row directly instead of matching the answer text.
+    
+    Args:
+        response: JSON array of {"question", "answer", "id"} objects
+        words: Words of the prompt entries, indexed by id
+        page_ids: Page IDs of the prompt entries, indexed by id
+        
+    Returns:
+        List of (question, answer, page_id) tuples; items with an unknown id are skipped
+    """
+    qa_items = []
+    for item in json.loads(response):
+        if not isinstance(item, dict):
+            continue
+        item_id = item.get('id')
+        question = str(item.get('question', '')).strip()
+        if not isinstance(item_id, int) or not 0 <= item_id < len(words) or not question:
+            continue
+        qa_items.append((question, words[item_id], page_ids[item_id]))
+    
+    return qa_items
+
 def run_quiz(qa_pairs: List[Tuple[str, str]]):
     """
     Run an interactive quiz with the given Q&A pairs.
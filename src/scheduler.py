@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+from Notion import (CREATED_TIME_COLUMN_NAME, SRS_INTERVAL_COLUMN_NAME, SRS_EASE_COLUMN_NAME,
+                    SRS_REPETITIONS_COLUMN_NAME, SRS_DUE_COLUMN_NAME)
+
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def utc_now() -> datetime:
+    """Current time as a naive UTC datetime, the representation used for due dates"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ReviewState(NamedTuple):
+    interval: float  # Days until the next review
+    ease: float  # SM-2 easiness factor
+    repetitions: int  # Number of successful reviews in a row
+    due: datetime  # Next review time (naive UTC)
+
+
+def sm2_review(state: ReviewState, quality: int, now: datetime) -> ReviewState:
+    """
+    Apply one SM-2 review.
+
+    Args:
+        state: Current review state
+        quality: Answer quality from 0 (blackout) to 5 (perfect)
+        now: Review time
+
+    Returns:
+        New review state
+    """
+    if quality >= 3:
+        if state.repetitions == 0:
+            interval = 1.0
+        elif state.repetitions == 1:
+            interval = 6.0
+        else:
+            interval = float(round(state.interval * state.ease))
+        repetitions = state.repetitions + 1
+    else:
+        interval = 1.0
+        repetitions = 0
+    ease = max(MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return ReviewState(interval, ease, repetitions, now + timedelta(days=interval))
+
+
+def stored_review_state(interval, ease, repetitions, due) -> Optional[ReviewState]:
+    """
+    Build a review state from stored SRS values (e.g. a page merged from Notion).
+
+    Returns:
+        The review state, or None if no due date is stored
+    """
+    due = pd.to_datetime(due, utc=True, format='ISO8601', errors='coerce')
+    if pd.isna(due):
+        return None
+    return ReviewState(
+        float(0 if pd.isna(interval) else interval),
+        float(DEFAULT_EASE if pd.isna(ease) else ease),
+        int(0 if pd.isna(repetitions) else repetitions),
+        due.tz_convert(None).to_pydatetime()
+    )
+
+
+class ReviewScheduler:
+    """
+    Due queue of words ordered by their next review time.
+
+    The queue is a binary heap of (due timestamp, sequence, page_id). Rescheduling
+    pushes a new entry and leaves the old one behind; stale entries are recognized
+    by their sequence number and skipped when popped, so both taking the next due
+    words and rescheduling are O(log n).
+    """
+
+    def __init__(self):
+        self.states: Dict[str, ReviewState] = {}
+        self.row_of: Dict[str, int] = {}  # page_id -> row position in the DataFrame
+        self.heap = []
+        self.latest: Dict[str, int] = {}  # page_id -> sequence of its live heap entry
+        self.counter = itertools.count()
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, now: datetime = None) -> 'ReviewScheduler':
+        """
+        Build the queue from the vocabulary DataFrame. Words without a stored
+        schedule are new and due at their creation time, oldest first.
+
+        Args:
+            df: DataFrame with page_id, created_time and the SRS columns
+            now: Current time (default: utc_now())
+        """
+        now = now or utc_now()
+        scheduler = cls()
+        due = pd.to_datetime(
+            df[SRS_DUE_COLUMN_NAME], utc=True, format='ISO8601', errors='coerce'
+        ).dt.tz_convert(None)
+        created = pd.to_datetime(
+            df[CREATED_TIME_COLUMN_NAME], utc=True, format='ISO8601', errors='coerce'
+        ).dt.tz_convert(None)
+        due = due.fillna(created).fillna(pd.Timestamp(now))
+        intervals = df[SRS_INTERVAL_COLUMN_NAME].fillna(0).to_numpy(dtype=np.float64)
+        eases = df[SRS_EASE_COLUMN_NAME].fillna(DEFAULT_EASE).to_numpy(dtype=np.float64)
+        repetitions = df[SRS_REPETITIONS_COLUMN_NAME].fillna(0).to_numpy(dtype=np.int64)
+
+        for row, (page_id, interval, ease, reps, due_time) in enumerate(zip(
+                df['page_id'], intervals, eases, repetitions, due.dt.to_pydatetime())):
+            scheduler.row_of[page_id] = row
+            scheduler.states[page_id] = ReviewState(float(interval), float(ease), int(reps), due_time)
+            sequence = next(scheduler.counter)
+            scheduler.latest[page_id] = sequence
+            scheduler.heap.append((due_time.timestamp(), sequence, page_id))
+        heapq.heapify(scheduler.heap)
+        return scheduler
+
+    def __len__(self):
+        return len(self.latest)
+
+    def _push(self, page_id: str, state: ReviewState):
+        sequence = next(self.counter)
+        self.states[page_id] = state
+        self.latest[page_id] = sequence
+        heapq.heappush(self.heap, (state.due.timestamp(), sequence, page_id))
+
+        # Drop stale entries once they make up most of the heap
+        if len(self.heap) > 2 * len(self.latest) + 64:
+            self.heap = [entry for entry in self.heap if self.latest.get(entry[2]) == entry[1]]
+            heapq.heapify(self.heap)
+
+    def next_due(self, n: int, now: datetime = None, study_ahead: bool = True) -> List[str]:
+        """
+        Get the n words whose review is most overdue.
+        The words stay in the queue until they are reviewed.
+
+        Args:
+            n: Number of words
+            now: Current time (default: utc_now())
+            study_ahead: If fewer than n words are due, fill up with the words due soonest
+
+        Returns:
+            List of page IDs, most overdue first
+        """
+        now_ts = (now or utc_now()).timestamp()
+        taken = []
+        while self.heap and len(taken) < n:
+            due_ts, sequence, page_id = heapq.heappop(self.heap)
+            if self.latest.get(page_id) != sequence:
+                continue  # Stale entry of a rescheduled word
+            if due_ts > now_ts and not study_ahead:
+                heapq.heappush(self.heap, (due_ts, sequence, page_id))
+                break
+            taken.append((due_ts, sequence, page_id))
+
+        # Put the words back, they are only rescheduled once reviewed
+        for entry in taken:
+            heapq.heappush(self.heap, entry)
+        return [page_id for _, _, page_id in taken]
+
+    def set_state(self, page_id: str, state: ReviewState):
+        """Replace the review state of a known word, e.g. with one stored by another device"""
+        if page_id in self.states:
+            self._push(page_id, state)
+
+    def review(self, page_id: str, quality: int, now: datetime = None) -> Optional[ReviewState]:
+        """
+        Record a review and reschedule the word.
+
+        Args:
+            page_id: Page ID of the reviewed word
+            quality: Answer quality from 0 to 5
+            now: Review time (default: utc_now())
+
+        Returns:
+            The new review state, or None if the word is unknown
+        """
+        state = self.states.get(page_id)
+        if state is None:
+            return None
+        new_state = sm2_review(state, quality, now or utc_now())
+        self._push(page_id, new_state)
+        return new_state
@@ -0,0 +1,157 @@
+import pandas as pd
+import numpy as np
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Optional
+from Notion import (WORD_COLUMN_NAME, MEANING_COLUMN_NAME, MULTIPLICITY_COLUMN_NAME, CREATED_TIME_COLUMN_NAME,
+                    SRS_INTERVAL_COLUMN_NAME, SRS_EASE_COLUMN_NAME, SRS_REPETITIONS_COLUMN_NAME, SRS_DUE_COLUMN_NAME,
+                    SOURCE_COLUMN_NAME, LAST_EDITED_TIME_COLUMN_NAME)
+
+
+SNAPSHOT_MAGIC = b'ESVOCAB\x00'
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = os.path.join('cache', 'vocabulary.snapshot')
+
+# Column name -> storage kind of the vocabulary DataFrame
+VOCABULARY_SCHEMA = {
+    'page_id': 'str',
+    WORD_COLUMN_NAME: 'str',
+    MEANING_COLUMN_NAME: 'str',
+    MULTIPLICITY_COLUMN_NAME: 'int64',
+    CREATED_TIME_COLUMN_NAME: 'datetime64',
+    SRS_INTERVAL_COLUMN_NAME: 'float64',
+    SRS_EASE_COLUMN_NAME: 'float64',
+    SRS_REPETITIONS_COLUMN_NAME: 'float64',
+    SRS_DUE_COLUMN_NAME: 'datetime64',
+    SOURCE_COLUMN_NAME: 'str',
+    LAST_EDITED_TIME_COLUMN_NAME: 'datetime64',
+}
+
+# magic, version, n_rows, header length
+PREAMBLE = struct.Struct('<8sIQI')
+ALIGNMENT = 8
+
+
+def _pad(length: int) -> int:
+    return (-length) % ALIGNMENT
+
+
+def _encode_column(series: pd.Series, kind: str) -> Dict[str, bytes]:
+    """Encode a column into its fixed-width buffers"""
+    if kind == 'str':
+        values = series.fillna('').astype(str).tolist()
+        # Offsets are in characters so that the blob can be decoded in one call and sliced
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in values], out=offsets[1:])
+        return {'offsets': offsets.tobytes(), 'data': ''.join(values).encode('utf-8')}
+    if kind == 'int64':
+        return {'data': series.fillna(0).to_numpy(dtype=np.int64).tobytes()}
+    if kind == 'float64':
+        return {'data': series.to_numpy(dtype=np.float64, na_value=np.nan).tobytes()}
+    if kind == 'datetime64':
+        times = pd.to_datetime(series, utc=True, format='ISO8601').dt.tz_convert(None)
+        values = times.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        return {'data': values.tobytes()}
+    raise ValueError(f"Unsupported column kind '{kind}'")
+
+
+def save_snapshot(df: pd.DataFrame, path: str, database_id: str, schema: Dict[str, str] = None):
+    """
+    Write the vocabulary DataFrame to a binary snapshot file.
+
+    Layout: a fixed preamble (magic, version, row count, header length), a JSON
+    header describing the database ID, schema and buffer offsets, then one
+    8-byte aligned buffer per numeric column and an offset table plus UTF-8
+    blob per string column. The file is written to a temporary path and moved
+    into place, so readers never see a partial snapshot.
+
+    Args:
+        df: Vocabulary DataFrame
+        path: Snapshot file path
+        database_id: Identifier of the Notion database(s) the vocabulary was loaded from
+        schema: Column name -> storage kind (default: VOCABULARY_SCHEMA)
+    """
+    schema = schema or VOCABULARY_SCHEMA
+    buffers = []
+    layout = {}
+    position = 0
+    for column, kind in schema.items():
+        layout[column] = {'kind': kind}
+        for name, buffer in _encode_column(df[column], kind).items():
+            layout[column][name] = [position, len(buffer)]
+            buffers.append(buffer)
+            buffers.append(b'\x00' * _pad(len(buffer)))
+            position += len(buffer) + _pad(len(buffer))
+
+    header = json.dumps({
+        'database_id': database_id,
+        'schema': schema,
+        'layout': layout,
+    }).encode('utf-8')
+    header += b' ' * _pad(PREAMBLE.size + len(header))
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(df), len(header)))
+        file.write(header)
+        for buffer in buffers:
+            file.write(buffer)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str, database_id: str, schema: Dict[str, str] = None) -> Optional[pd.DataFrame]:
+    """
+    Memory-map a snapshot written by save_snapshot and build the vocabulary DataFrame.
+    Numeric columns are copied out of the mapped buffers with one memcpy each, and
+    string columns are decoded with one UTF-8 decode per column and sliced with the
+    offset table. The mapping is closed before returning because the next
+    save_snapshot replaces the file, which Windows refuses while it is mapped.
+
+    Args:
+        path: Snapshot file path
+        database_id: Expected identifier of the Notion database(s)
+        schema: Expected column name -> storage kind (default: VOCABULARY_SCHEMA)
+
+    Returns:
+        DataFrame, or None if the file is missing, from another version,
+        another database or another schema
+    """
+    schema = schema or VOCABULARY_SCHEMA
+    if not os.path.exists(path) or os.path.getsize(path) < PREAMBLE.size:
+        return None
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        magic, version, n_rows, header_length = PREAMBLE.unpack_from(mapped, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        header = json.loads(bytes(mapped[PREAMBLE.size:PREAMBLE.size + header_length]))
+        if header.get('database_id') != database_id or header.get('schema') != schema:
+            return None
+
+        base = PREAMBLE.size + header_length
+        columns = {}
+        for column, kind in schema.items():
+            entry = header['layout'][column]
+            start, length = entry['data']
+            if kind == 'str':
+                offset_start, _ = entry['offsets']
+                offsets = np.frombuffer(mapped, dtype=np.int64, count=n_rows + 1, offset=base + offset_start)
+                text = bytes(mapped[base + start:base + start + length]).decode('utf-8')
+                columns[column] = [text[a:b] for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+                del offsets
+            else:
+                values = np.frombuffer(mapped, dtype=np.int64 if kind != 'float64' else np.float64,
+                                       count=n_rows, offset=base + start).copy()
+                if kind == 'datetime64':
+                    values = values.view('datetime64[ns]')
+                columns[column] = values
+
+    return pd.DataFrame(columns)
@@ -0,0 +1,144 @@
+import threading
+import time
+from queue import Queue, Empty
+from typing import Any, Callable, Optional
+from latency import LatencyTracker
+
+
+RESULTS_EVENT = '<<WorkerResults>>'
+
+
+class TaskCancelled(Exception):
+    """Raised inside a background task to stop it early after a cancel request"""
+
+
+class UiChannel:
+    """
+    Deliver messages from background threads to the Tk thread without polling.
+
+    put() queues a message and, unless a wake-up is already pending, posts a
+    virtual event to the Tk event loop with event_generate (which may be called
+    from other threads). The event handler drains every queued message, so the Tk
+    thread only wakes up when there is something to handle and a burst of
+    messages costs one wake-up. The time from put() to handling is recorded in
+    a LatencyTracker.
+    """
+
+    def __init__(self, root, handler: Callable[[dict], None], event: str = RESULTS_EVENT):
+        self.root = root
+        self.handler = handler
+        self.event = event
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.wake_pending = False
+        self.closed = False
+        self.latency = LatencyTracker()  # Seconds from put() to handling on the Tk thread
+        root.bind(event, lambda _event: self.drain())
+        # Pick up messages whose wake-up was lost because the event loop was not running yet
+        root.after(0, self.drain)
+
+    def put(self, message: dict):
+        if self.closed:
+            return
+        self.queue.put((time.perf_counter(), message))
+        with self.lock:
+            if self.wake_pending:
+                return
+            self.wake_pending = True
+        try:
+            self.root.event_generate(self.event, when='tail')
+        except Exception:
+            # The event loop is not running (yet or anymore); the next put() or drain() picks the message up
+            with self.lock:
+                self.wake_pending = False
+
+    def drain(self):
+        """Handle all queued messages (call on the Tk thread)"""
+        with self.lock:
+            self.wake_pending = False
+        while True:
+            try:
+                sent, message = self.queue.get_nowait()
+            except Empty:
+                return
+            self.latency.record(time.perf_counter() - sent)
+            self.handler(message)
+
+    def close(self):
+        """Handle the messages still queued and ignore any sent afterwards"""
+        self.drain()
+        self.closed = True
+
+
+class BackgroundTask:
+    """
+    Run a function on a daemon thread and report back through a queue.
+
+    The function receives the task itself so it can call report_progress() and
+    check_cancelled(), and report_partial() to hand over an intermediate result.
+    Progress messages, partial results and the final outcome are put on the
+    result queue (a Queue or UiChannel) as dicts with 'type' set to 'progress',
+    'partial', 'done', 'error' or 'cancelled' and 'task' set to this task; the Tk
+    thread handles them and calls deliver(), so the callbacks always run on the
+    Tk thread.
+    """
+
+    def __init__(self, name: str, work: Callable[['BackgroundTask'], Any], result_queue: Queue,
+                 on_done: Callable[[Any], None] = None, on_error: Callable[[str], None] = None,
+                 on_progress: Callable[[str], None] = None, on_partial: Callable[[Any], None] = None):
+        self.name = name
+        self.work = work
+        self.result_queue = result_queue
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_partial = on_partial
+        self.cancel_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def start(self) -> 'BackgroundTask':
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Request cancellation; any result produced afterwards is discarded"""
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+
+    def report_progress(self, message: str):
+        self.result_queue.put({'type': 'progress', 'task': self, 'message': message})
+
+    def report_partial(self, result: Any):
+        """Hand an intermediate result to on_partial while the task keeps running"""
+        self.result_queue.put({'type': 'partial', 'task': self, 'result': result})
+
+    def _run(self):
+        try:
+            result = self.work(self)
+            self.check_cancelled()
+            self.result_queue.put({'type': 'done', 'task': self, 'result': result})
+        except TaskCancelled:
+            self.result_queue.put({'type': 'cancelled', 'task': self})
+        except Exception as e:
+            self.result_queue.put({'type': 'error', 'task': self, 'error': str(e)})
+
+    def deliver(self, result: dict):
+        """Dispatch a result from the queue to the callbacks (call on the Tk thread)"""
+        if self.cancelled:
+            return
+        if result['type'] == 'progress' and self.on_progress:
+            self.on_progress(result['message'])
+        elif result['type'] == 'partial' and self.on_partial:
+            self.on_partial(result['result'])
+        elif result['type'] == 'done' and self.on_done:
+            self.on_done(result['result'])
+        elif result['type'] == 'error' and self.on_error:
+            self.on_error(result['error'])